@@ -0,0 +1,88 @@
+"""Run the transcript -> segments -> evaluation pipeline for many videos without the UI.
+
+The manifest is a JSONL file with one video per line:
+
+    {"officer": "Pavlo", "title": "Traffic stop", "url": "https://www.youtube.com/watch?v=..."}
+
+Every stage is saved to the database as soon as it finishes, so re-running the
+same manifest after an interruption resumes each video at its first missing stage.
+
+    python batch.py manifest.jsonl --workers 4
+"""
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import ratelimit
+import storage
+from jobs import STAGES, run_stage
+
+
+def read_manifest(path) -> list:
+    entries = []
+    with open(path, "r") as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if not entry.get("officer") or not entry.get("url"):
+                raise ValueError(f"{path}:{line_number}: every entry needs an officer and a url")
+            entries.append(entry)
+    return entries
+
+
+def process_video(entry, redo=()):
+    """Run the missing stages for one manifest entry, checkpointing each one. Returns the stages run."""
+    officer, url = entry["officer"], entry["url"]
+    video = storage.get_video(officer, url)
+    if video is None:
+        storage.add_video(officer, entry.get("title") or url, url)
+        video = storage.get_video(officer, url)
+
+    ran = []
+    for stage in STAGES:
+        if video.get(stage) and stage not in redo:
+            continue
+        # a stage run again on purpose must not come back from the caches
+        video[stage] = run_stage(officer, url, stage, refresh=stage in redo)
+        # later stages are derived from this one, so they are stale now
+        redo = set(redo) | set(STAGES[STAGES.index(stage) + 1:])
+        ran.append(stage)
+    return ran
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="JSONL file with officer, title and url per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--redo", nargs="*", choices=STAGES, default=[], help="stages to recompute even if saved")
+    args = parser.parse_args(argv)
+
+    entries = read_manifest(args.manifest)
+    storage.connect().close()  # create and migrate the database once, before the workers race for it
+
+    workers = max(1, min(args.workers, len(entries)))
+    print(f"Processing {len(entries)} videos with {workers} workers...")
+    failed = 0
+    # the workers share the account's rate limits, so each gets an equal part of them
+    with ProcessPoolExecutor(max_workers=workers, initializer=ratelimit.share_limits, initargs=(workers,)) as executor:
+        futures = {executor.submit(process_video, entry, args.redo): entry for entry in entries}
+        for future in as_completed(futures):
+            entry = futures[future]
+            try:
+                ran = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"FAILED {entry['officer']} {entry['url']}: {e}")
+                continue
+            print(f"done   {entry['officer']} {entry['url']}: {', '.join(ran) or 'already complete'}")
+
+    print(f"{len(entries) - failed}/{len(entries)} videos complete")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
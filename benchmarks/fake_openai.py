@@ -0,0 +1,161 @@
+"""A local stand-in for the OpenAI API used by processing.py, with configurable latency and errors."""
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEGMENTS = """### Segment 1: Scene Arrival & Commands Issued
+- Estimated Timestamp: [0s - 20s]
+- Summary:
+- Officer responds to a disturbance and issues commands.
+---
+### Segment 2: Suspect Secured & Interviewed
+- Estimated Timestamp: [20s - 60s]
+- Summary:
+- Officer restrains the suspect and interviews bystanders."""
+
+EVALUATION = """**Domain**: Minimal Harm
+**Subdomain**: Citizen Injury Avoidance
+**Quote**: Can you stand up if I assist you?
+**Summary**: The officer assists the suspect while avoiding further harm.
+**Reference**: Segment 2 - Suspect Secured & Interviewed (20s - 60s)
+
+**Domain**: Skillful Actions
+**Subdomain**: De-escalation
+**Quote**: Take a breath, nobody is getting hurt.
+**Summary**: The officer calms the situation down before using force.
+**Reference**: Segment 1 - Scene Arrival & Commands Issued (0s - 20s)"""
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, request, content, usage, duration):
+        """Send content as server-sent chat.completion.chunk events, spread over duration seconds."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(choices, usage=None):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": choices,
+                "usage": usage,
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        pieces = content.split(" ")
+        for i, piece in enumerate(pieces):
+            delta = {"role": "assistant", "content": piece} if i == 0 else {"content": " " + piece}
+            event([{"index": 0, "delta": delta, "finish_reason": None}])
+            time.sleep(duration / len(pieces))
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event([], usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        request_body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        server.record_request(self.path, len(request_body))
+        request = json.loads(request_body) if self.path.endswith("/chat/completions") else {}
+        latency = max(0.0, random.gauss(server.latency, server.jitter))
+        # a streamed answer starts after a fraction of the latency and spreads the rest over its pieces
+        time.sleep(latency * server.first_token_fraction if request.get("stream") else latency)
+
+        if random.random() < server.error_rate:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                headers={"Retry-After": "0.1"},
+            )
+            return
+
+        if self.path.endswith("/audio/transcriptions"):
+            self._send_json(200, {"text": f"Synthetic transcript of {len(request_body)} bytes of audio."})
+        elif self.path.endswith("/chat/completions"):
+            prompt = request["messages"][-1]["content"]
+            content = SEGMENTS if "Segment the Transcript" in prompt else EVALUATION
+            usage = {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            }
+            if request.get("stream"):
+                self._send_stream(request, content, usage, latency * (1 - server.first_token_fraction))
+                return
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, port=0, first_token_fraction=0.1):
+        super().__init__(("127.0.0.1", port), FakeOpenAIHandler)
+        self.latency = latency
+        self.first_token_fraction = first_token_fraction
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def record_request(self, path, num_bytes):
+        with self._lock:
+            self.requests.append((path, num_bytes))
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 429")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.latency, args.jitter, args.error_rate, port=args.port)
+    print(f"Fake OpenAI API on {server.base_url} (set OPENAI_BASE_URL to use it)")
+    server.serve_forever()
@@ -0,0 +1,297 @@
+"""Offline benchmarks for the transcription pipeline and the officer data paths.
+
+OpenAI is replaced by a local fake server (benchmarks/fake_openai.py) and YouTube
+by a local HTTP media server, so no network access or API key is needed.
+
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import platform
+import tracemalloc
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.synthetic import MediaServer, generate_audio, generate_officers_data
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Recorder:
+    """Collects wall time, request latencies and peak traced memory per benchmark."""
+
+    def __init__(self):
+        self.results = {}
+
+    def measure(self, name, fn, amount=None, unit=None, latencies=None, repeat=1):
+        walls = []
+        peak = 0
+        for _ in range(repeat):
+            if latencies is not None:
+                latencies.clear()
+            tracemalloc.start()
+            start = time.perf_counter()
+            fn()
+            walls.append(time.perf_counter() - start)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        wall = percentile(walls, 50)
+        samples = latencies if latencies else walls
+        result = {
+            "wall_s": round(wall, 4),
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "samples": len(samples),
+            "peak_mb": round(peak / 2 ** 20, 2),
+        }
+        if amount is not None:
+            result["throughput"] = round(amount / wall, 2) if wall else None
+            result["unit"] = f"{unit}/s"
+        self.results[name] = result
+        print(f"{name:<40} {result['wall_s']:>9.3f}s  p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+              f"peak {result['peak_mb']:>8.2f}MB" + (f"  {result['throughput']} {result['unit']}" if amount is not None else ""))
+        return result
+
+
+def timed(fn, latencies):
+    """Wrap fn so every call appends its duration to latencies."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def bench_pipeline(recorder, args, work_dir, media_dir, media):
+    import processing
+
+    # pay for lazy imports (OpenAI client, yt-dlp extractors, resampler) before anything is measured
+    processing.get_client()
+    warmup = generate_audio(os.path.join(media_dir, "warmup.mp3"), 2)
+    processing.chunk_audio(warmup, 1, tempfile.mkdtemp(dir=work_dir))
+    if shutil.which("ffmpeg"):
+        processing.youtube_to_mp3(media.url("warmup.mp3"), tempfile.mkdtemp(dir=work_dir))
+
+    for seconds in args.audio_lengths:
+        source = generate_audio(os.path.join(media_dir, f"audio_{seconds}s.mp3"), seconds, seed=seconds)
+        label = f"{seconds}s"
+
+        if shutil.which("ffmpeg"):
+            download_dir = os.path.join(work_dir, f"download_{label}")
+            recorder.measure(
+                f"youtube_to_mp3[{label}]",
+                lambda: processing.youtube_to_mp3(media.url(os.path.basename(source)), download_dir),
+                amount=seconds, unit="audio_s", repeat=args.repeat,
+            )
+        else:
+            print(f"youtube_to_mp3[{label}] skipped: ffmpeg is not installed")
+
+        chunks = []
+        recorder.measure(
+            f"chunk_audio[{label}]",
+            lambda: chunks.__setitem__(slice(None), processing.chunk_audio(source, 20, tempfile.mkdtemp(dir=work_dir))),
+            amount=seconds, unit="audio_s", repeat=args.repeat,
+        )
+        recorder.measure(
+            f"chunk_audio_in_memory[{label}]",
+            lambda: processing.chunk_audio(source, 20),
+            amount=seconds, unit="audio_s", repeat=args.repeat,
+        )
+        recorder.measure(
+            f"chunk_audio_on_silence[{label}]",
+            lambda: processing.chunk_audio_on_silence(source, 20, tempfile.mkdtemp(dir=work_dir)),
+            amount=seconds, unit="audio_s", repeat=args.repeat,
+        )
+
+        latencies = []
+        transcribe_chunk = processing.transcribe_chunk
+        processing.transcribe_chunk = timed(transcribe_chunk, latencies)
+        try:
+            recorder.measure(
+                f"transcribe_audio[{label}]",
+                lambda: processing.transcribe_audio(chunks, use_cache=False),
+                amount=seconds, unit="audio_s", latencies=latencies, repeat=args.repeat,
+            )
+        finally:
+            processing.transcribe_chunk = transcribe_chunk
+
+    latencies = []
+    ask = timed(processing.ask_gpt, latencies)
+    recorder.measure(
+        "ask_gpt",
+        lambda: [ask(f"Benchmark prompt {i}", use_cache=False) for i in range(args.requests)],
+        amount=args.requests, unit="requests", latencies=latencies,
+    )
+
+    latencies = []
+
+    def first_content(i):
+        start = time.perf_counter()
+        stream = processing.ask_gpt_stream(f"Benchmark prompt {i}", use_cache=False)
+        next(stream)
+        latencies.append(time.perf_counter() - start)
+        for _ in stream:
+            pass
+
+    recorder.measure(
+        "ask_gpt_stream[first_content]",
+        lambda: [first_content(i) for i in range(args.requests)],
+        amount=args.requests, unit="requests", latencies=latencies,
+    )
+
+
+def bench_data(recorder, args, work_dir):
+    import storage
+
+    rng = random.Random(0)
+    for num_videos in args.data_sizes:
+        label = f"{num_videos}_videos"
+        json_path = generate_officers_data(os.path.join(work_dir, f"officers_{label}.json"), num_videos)
+        storage.DB_PATH = os.path.join(work_dir, f"officers_{label}.db")
+        storage.JSON_PATH = json_path
+
+        # the first connection migrates the JSON file into the database
+        recorder.measure(f"import_json[{label}]", lambda: storage.connect().close(), amount=num_videos, unit="videos")
+
+        officers = storage.list_officers()
+        latencies = []
+        recorder.measure(
+            f"list_officers[{label}]",
+            lambda: [timed(storage.list_officers, latencies)() for _ in range(args.requests)],
+            amount=args.requests, unit="queries", latencies=latencies,
+        )
+
+        latencies = []
+        recorder.measure(
+            f"get_videos[{label}]",
+            lambda: [timed(storage.get_videos, latencies)(rng.choice(officers)) for _ in range(args.requests)],
+            amount=args.requests, unit="queries", latencies=latencies,
+        )
+
+        latencies = []
+        recorder.measure(
+            f"get_evaluations[{label}]",
+            lambda: [
+                timed(storage.get_evaluations, latencies)(rng.choice(officers), "Skillful Actions", ["De-escalation", "Force Avoidance"])
+                for _ in range(args.requests)
+            ],
+            amount=args.requests, unit="queries", latencies=latencies,
+        )
+
+        latencies = []
+        recorder.measure(
+            f"search[{label}]",
+            lambda: [timed(storage.search, latencies)(rng.choice(["taser", "hands ground", '"okay sir"', "help"])) for _ in range(args.requests)],
+            amount=args.requests, unit="queries", latencies=latencies,
+        )
+
+        latencies = []
+
+        def update_random_video():
+            officer = rng.choice(officers)
+            video = storage.get_videos(officer)[0]
+            timed(storage.update_video, latencies)(officer, video["url"], evaluation=video["evaluation"])
+
+        recorder.measure(
+            f"update_video[{label}]",
+            lambda: [update_random_video() for _ in range(args.requests)],
+            amount=args.requests, unit="updates", latencies=latencies,
+        )
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against baseline for every benchmark and return the names that regressed."""
+    regressions = []
+    print(f"\nComparison with baseline (tolerance {tolerance:.0%}):")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"  {name:<40} new")
+            continue
+        before = baseline[name]["wall_s"]
+        change = (result["wall_s"] - before) / before if before else 0.0
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"  {name:<40} {before:>9.3f}s -> {result['wall_s']:>9.3f}s  {change:+.0%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio-lengths", type=int, nargs="*", default=[60, 600], help="synthetic audio lengths in seconds")
+    parser.add_argument("--data-sizes", type=int, nargs="*", default=[10, 1000], help="number of videos in the synthetic officers data")
+    parser.add_argument("--requests", type=int, default=20, help="requests per latency benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per audio benchmark (the median is reported)")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean latency of the fake OpenAI server in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="latency standard deviation of the fake OpenAI server")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake OpenAI requests answered with a 429")
+    parser.add_argument("--skip-pipeline", action="store_true", help="only run the data path benchmarks")
+    parser.add_argument("--skip-data", action="store_true", help="only run the pipeline benchmarks")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="benchmark-")
+    media_dir = os.path.join(work_dir, "media")
+    os.makedirs(media_dir)
+
+    fake_openai = FakeOpenAIServer(args.latency, args.jitter, args.error_rate).start()
+    media = MediaServer(media_dir).start()
+
+    # must be set before processing, cache and storage are imported
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["OPENAI_BASE_URL"] = fake_openai.base_url
+    os.environ["CACHE_DIR"] = os.path.join(work_dir, "cache")
+    os.environ["OFFICERS_DB"] = os.path.join(work_dir, "officers.db")
+    # the fake server has no quota, so only throttle if limits are set explicitly
+    for name in ("WHISPER_RPM", "CHAT_RPM", "CHAT_TPM"):
+        os.environ.setdefault(name, "1000000")
+
+    recorder = Recorder()
+    try:
+        if not args.skip_pipeline:
+            bench_pipeline(recorder, args, work_dir, media_dir, media)
+        if not args.skip_data:
+            bench_data(recorder, args, work_dir)
+    finally:
+        fake_openai.shutdown()
+        media.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": recorder.results,
+            }, file, indent=4)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)["results"]
+        if compare(recorder.results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
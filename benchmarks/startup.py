@@ -0,0 +1,119 @@
+"""Startup benchmark: module import times and time to first render of the Streamlit app.
+
+Every measurement runs in a fresh interpreter, so nothing is already imported.
+Time to first render runs main.py once through Streamlit's AppTest, against a
+new database (which imports assets/officers_data.json) and against an existing one.
+
+    python -m benchmarks.startup --save-baseline benchmarks/startup_baseline.json
+    python -m benchmarks.startup --compare benchmarks/startup_baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from benchmarks.run import percentile, compare
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ("storage", "jobs", "processing", "streamlit")
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+RENDER_SNIPPET = """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("main.py", default_timeout=120).run()
+elapsed = time.perf_counter() - start
+if app.exception:
+    raise SystemExit(app.exception[0].message)
+print(elapsed)
+"""
+
+
+def run_snippet(snippet, env):
+    """Run snippet in a new interpreter in the repo and return the seconds it prints last."""
+    result = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=REPO_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or result.stdout.strip())
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure(results, name, fn, repeat):
+    walls = [fn() for _ in range(repeat)]
+    results[name] = {
+        "wall_s": round(percentile(walls, 50), 4),
+        "p50_ms": round(percentile(walls, 50) * 1000, 2),
+        "p95_ms": round(percentile(walls, 95) * 1000, 2),
+        "samples": len(walls),
+    }
+    print(f"{name:<40} {results[name]['wall_s']:>9.3f}s  p95 {results[name]['p95_ms']:>9.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (the median is reported)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="startup-")
+    db_path = os.path.join(work_dir, "officers.db")
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "benchmark"),
+        OFFICERS_DB=db_path,
+        CACHE_DIR=os.path.join(work_dir, "cache"),
+        METRICS_LOG=os.path.join(work_dir, "metrics.jsonl"),
+        WORK_DIR=os.path.join(work_dir, "work"),
+    )
+
+    def render_new_db():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        return run_snippet(RENDER_SNIPPET, env)
+
+    results = {}
+    try:
+        for module in MODULES:
+            measure(results, f"import[{module}]", lambda: run_snippet(IMPORT_SNIPPET.format(module=module), env), args.repeat)
+        measure(results, "first_render[new_db]", render_new_db, args.repeat)
+        measure(results, "first_render", lambda: run_snippet(RENDER_SNIPPET, env), args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            }, file, indent=4)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)["results"]
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Synthetic inputs for the benchmarks: audio files, officers_data.json files and a local media server."""
+import sys
+import json
+import random
+import threading
+import functools
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import soundfile as sf
+
+
+def generate_audio(path, seconds, sr=44100, channels=2, speech_ratio=0.6, seed=0):
+    """Write a recording of alternating noise bursts ("speech") and near-silence, like bodycam footage with pauses."""
+    rng = np.random.default_rng(seed)
+    with sf.SoundFile(path, "w", samplerate=sr, channels=channels) as audio:
+        written = 0.0
+        while written < seconds:
+            speaking = rng.random() < speech_ratio
+            length = min(rng.uniform(1.0, 8.0) if speaking else rng.uniform(0.5, 6.0), seconds - written)
+            frames = int(length * sr)
+            amplitude = 0.2 if speaking else 0.0005
+            audio.write((rng.standard_normal((frames, channels)) * amplitude).astype(np.float32))
+            written += length
+    return path
+
+
+def generate_officers_data(path, num_videos, videos_per_officer=5, transcript_lines=60, seed=0):
+    """Write an officers_data.json with num_videos fully processed videos."""
+    # imported here: storage reads OFFICERS_DB on import, which the benchmarks set first
+    from storage import DOMAIN_SUBDOMAINS
+
+    rng = random.Random(seed)
+    data = {}
+    for i in range(num_videos):
+        officer = f"Officer {i // videos_per_officer:05d}"
+        transcript = [
+            f"[{j * 20}s - {j * 20 + 20}s]: " + " ".join(rng.choice(["stop", "hands", "ground", "okay", "sir", "help", "taser", "deployment"]) for _ in range(30))
+            for j in range(transcript_lines)
+        ]
+        evaluations = []
+        for segment in range(1, 5):
+            domain = rng.choice(list(DOMAIN_SUBDOMAINS))
+            evaluations.append(
+                f"**Domain**: {domain}\n"
+                f"**Subdomain**: {rng.choice(DOMAIN_SUBDOMAINS[domain])}\n"
+                f"**Quote**: {rng.choice(transcript).split(': ', 1)[1][:80]}\n"
+                f"**Summary**: The officer demonstrates the behavior.\n"
+                f"**Reference**: Segment {segment} - Synthetic ({segment * 100}s - {segment * 100 + 100}s)"
+            )
+        data.setdefault(officer, []).append({
+            "title": f"Synthetic video {i}",
+            "url": f"https://www.youtube.com/watch?v={i:011d}",
+            "transcript": transcript,
+            "segments": "### Segment 1: Synthetic\n- Summary:\n- Synthetic segment.",
+            "evaluation": "\n\n".join(evaluations),
+        })
+    with open(path, "w") as file:
+        json.dump(data, file)
+    return path
+
+
+class MediaServer(ThreadingHTTPServer):
+    """Serves a directory over HTTP so youtube_to_mp3 can download from it in place of YouTube."""
+    daemon_threads = True
+
+    def __init__(self, directory, port=0):
+        handler = functools.partial(QuietHandler, directory=directory)
+        super().__init__(("127.0.0.1", port), handler)
+
+    def handle_error(self, request, client_address):
+        # yt-dlp probes the file and drops the connection, which is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def url(self, filename):
+        return f"http://127.0.0.1:{self.server_address[1]}/{filename}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+
+def make_key(*parts) -> str:
+    """Hash the given str/bytes parts into a cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """JSON values stored one file per key, evicted least recently used first once max_bytes is exceeded.
+
+    Reads touch the entry's mtime, so mtime order is LRU order and survives restarts.
+    The LRU order is kept in memory, built from the directory on first use, and
+    eviction goes down to low_water * max_bytes so it does not run on every insert.
+    Entries older than max_age seconds (if set) are treated as misses and dropped.
+    """
+
+    def __init__(self, directory, max_bytes=100 * 1024 * 1024, max_age=None, low_water=0.9):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._index = None  # path -> size, least recently used first
+        self._size = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for root, dirs, files in os.walk(self.directory):
+            for f in files:
+                if f.endswith(".json"):
+                    yield os.path.join(root, f)
+
+    def _ensure_index(self):
+        if self._index is not None:
+            return
+        with self._index_lock:
+            if self._index is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for path in self._entries():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+            entries.sort()
+            with self._lock:
+                self._index = OrderedDict((path, size) for _, path, size in entries)
+                self._size = sum(self._index.values())
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        self._ensure_index()
+        path = self._path(key)
+        try:
+            with open(path, "r") as file:
+                entry = json.load(file)
+            value = entry["value"]
+        except (FileNotFoundError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if self.max_age is not None and time.time() - entry.get("created", 0) > self.max_age:
+            with self._lock:
+                self.misses += 1
+                self._forget(path)
+            self._remove_files([path])
+            return None
+        with self._lock:
+            self.hits += 1
+            if path in self._index:
+                self._index.move_to_end(path)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key, value):
+        self._ensure_index()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"value": value, "created": time.time()}, file)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            self._forget(path)
+            self._index[path] = size
+            self._size += size
+            if self._size > self.max_bytes:
+                while self._index and self._size > self.max_bytes * self.low_water:
+                    old_path, old_size = self._index.popitem(last=False)
+                    self._size -= old_size
+                    evicted.append(old_path)
+        self._remove_files(evicted)
+
+    def _forget(self, path):
+        size = self._index.pop(path, None)
+        if size is not None:
+            self._size -= size
+
+    def _remove_files(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        self._ensure_index()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes": self._size,
+            }
+
+
+transcription_cache = DiskCache(
+    os.path.join(CACHE_DIR, "transcriptions"),
+    max_bytes=int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", 100 * 1024 * 1024)),
+)
+
+completion_cache = DiskCache(
+    os.path.join(CACHE_DIR, "completions"),
+    max_bytes=int(os.getenv("COMPLETION_CACHE_MAX_BYTES", 50 * 1024 * 1024)),
+    max_age=float(os.getenv("COMPLETION_CACHE_MAX_AGE", 30 * 24 * 3600)),
+)
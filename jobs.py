@@ -0,0 +1,252 @@
+import os
+import time
+import threading
+from contextlib import closing
+
+import metrics
+import storage
+
+WORK_DIR = os.getenv("WORK_DIR", "work")
+
+# Overlap download, chunking and transcription (fixed-length chunks, no silence detection)
+STREAMING = os.getenv("STREAMING_PIPELINE", "0") == "1"
+
+# Maximum number of chunks of one video transcribed at once, per job
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "8"))
+
+# Cut chunks at speech pauses and skip long silences instead of fixed-length chunks
+VAD_CHUNKING = os.getenv("VAD_CHUNKING", "0") == "1"
+
+# Keep chunks in memory as compact low-bitrate MP3 instead of writing them to the workspace
+IN_MEMORY_CHUNKS = os.getenv("IN_MEMORY_CHUNKS", "0") == "1"
+
+STAGES = ("transcript", "segments", "evaluation")
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    officer TEXT NOT NULL,
+    url TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    progress REAL,
+    message TEXT,
+    partial TEXT,
+    refresh INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_video ON jobs (officer, url, id);
+"""
+
+ACTIVE = ("queued", "running")
+
+_workers = []
+_workers_lock = threading.Lock()
+
+_initialized = set()
+_schema_lock = threading.Lock()
+
+
+def _connect():
+    conn = storage.connect()
+    if storage.DB_PATH not in _initialized:
+        with _schema_lock:
+            if storage.DB_PATH not in _initialized:
+                conn.executescript(JOBS_SCHEMA)
+                columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+                # jobs tables created before segments and evaluations were streamed or could be regenerated
+                for column, definition in (("partial", "TEXT"), ("refresh", "INTEGER NOT NULL DEFAULT 0")):
+                    if column not in columns:
+                        with conn:
+                            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+                _initialized.add(storage.DB_PATH)
+    return conn
+
+
+def run_stage(officer, url, stage, progress=None, partial=None, refresh=False):
+    """Compute one pipeline stage of a video from the previous one and save it.
+
+    partial, if given, is called with the text generated so far while the
+    segments or the evaluation stream in. refresh=True recomputes the stage
+    without reusing cached chunks, transcriptions or answers, and clears the
+    later stages since they were derived from the old result.
+    """
+    from processing import summarize_youtube_video, segment_transcript, evaluate_officer_behavior
+
+    video = storage.get_video(officer, url)
+    with metrics.track(f"{stage} {url}") as run:
+        if stage == "transcript":
+            result = summarize_youtube_video(
+                url, WORK_DIR, use_vad=VAD_CHUNKING, progress=progress, streaming=STREAMING, in_memory=IN_MEMORY_CHUNKS,
+                refresh=refresh, max_workers=TRANSCRIBE_WORKERS
+            )
+        elif stage == "segments":
+            if progress is not None:
+                progress("llm", None, "Segmenting transcript...")
+            result = segment_transcript(video["transcript"], partial=partial, refresh=refresh)
+        elif stage == "evaluation":
+            if progress is not None:
+                progress("llm", None, "Evaluating officer behavior...")
+            result = evaluate_officer_behavior(video["segments"], partial=partial, refresh=refresh)
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+
+    fields = {stage: result}
+    if refresh:
+        fields.update((later, None) for later in STAGES[STAGES.index(stage) + 1:])
+    storage.update_video(officer, url, **fields)
+    storage.save_metrics(officer, url, stage, run.summary())
+    return result
+
+
+def enqueue(officer, url, stage, refresh=False) -> int:
+    """Queue a stage for a video, or return the id of the same job if it is already queued or running.
+
+    Jobs of one video run one at a time in the order they were queued, so a
+    stage never reads the output of a previous stage that is still being
+    written. refresh=True regenerates the stage, see run_stage.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage: {stage}")
+    with closing(_connect()) as conn, conn:
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE officer = ? AND url = ? AND stage = ? AND status IN ('queued', 'running')",
+            (officer, url, stage),
+        ).fetchone()
+        if row:
+            return row["id"]
+        now = time.time()
+        cursor = conn.execute(
+            "INSERT INTO jobs (officer, url, stage, refresh, message, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (officer, url, stage, int(refresh), "Waiting in queue...", now, now),
+        )
+        return cursor.lastrowid
+
+
+def get_job(job_id):
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def latest_job(officer, url):
+    """The most recent job of a video, whatever its status."""
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE officer = ? AND url = ? ORDER BY id DESC LIMIT 1", (officer, url)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def _claim_next(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # skip jobs of videos that have an earlier job still queued or running
+        row = conn.execute(
+            "SELECT * FROM jobs AS job WHERE status = 'queued' AND NOT EXISTS ("
+            "SELECT 1 FROM jobs AS other WHERE other.officer = job.officer AND other.url = job.url "
+            "AND other.status IN ('queued', 'running') AND other.id < job.id"
+            ") ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', message = 'Starting...', updated_at = ? WHERE id = ?",
+                (time.time(), row["id"]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return dict(row) if row else None
+
+
+def _update(job_id, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with closing(_connect()) as conn, conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _progress_reporter(job_id, min_interval=0.5):
+    """A progress(stage, fraction, message) callback that writes to the job row, at most every min_interval seconds."""
+    last_write = [0.0]
+
+    def progress(stage, fraction, message):
+        now = time.time()
+        if now - last_write[0] < min_interval and fraction not in (None, 1.0):
+            return
+        last_write[0] = now
+        _update(job_id, progress=fraction, message=message)
+
+    return progress
+
+
+def _partial_reporter(job_id, min_interval=0.25):
+    """A partial(text) callback that writes the text generated so far to the job row, at most every min_interval seconds."""
+    last_write = [0.0]
+
+    def partial(text):
+        now = time.time()
+        if now - last_write[0] < min_interval:
+            return
+        last_write[0] = now
+        _update(job_id, partial=text)
+
+    return partial
+
+
+def _run_job(job):
+    print(f"Job {job['id']}: {job['stage']} for {job['officer']} {job['url']}")
+    try:
+        run_stage(
+            job["officer"], job["url"], job["stage"],
+            progress=_progress_reporter(job["id"]), partial=_partial_reporter(job["id"]), refresh=bool(job["refresh"])
+        )
+    except Exception as e:
+        print(f"Job {job['id']} failed: {e}")
+        _update(job["id"], status="failed", error=str(e), message="Failed")
+    else:
+        _update(job["id"], status="done", progress=1.0, message="Done", partial=None)
+
+
+def _worker(poll_interval):
+    conn = None
+    while True:
+        # keep the worker alive through database errors, e.g. "database is locked" while a batch run writes
+        try:
+            if conn is None:
+                conn = _connect()
+            job = _claim_next(conn)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            _run_job(job)
+        except Exception as e:
+            print(f"Job worker error: {e}")
+            if conn is not None:
+                conn.close()
+                conn = None
+            time.sleep(poll_interval)
+
+
+def start_workers(num_workers=2, poll_interval=1.0):
+    """Start the background worker threads once per process.
+
+    Jobs left running by a previous process that died are queued again.
+    """
+    with _workers_lock:
+        if _workers:
+            return
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', message = 'Waiting in queue...', updated_at = ? "
+                "WHERE status = 'running'",
+                (time.time(),),
+            )
+        for _ in range(num_workers):
+            thread = threading.Thread(target=_worker, args=(poll_interval,), daemon=True)
+            thread.start()
+            _workers.append(thread)
@@ -1,42 +1,52 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import json, re
-from processing import summarize_youtube_video, segment_transcript, evaluate_officer_behavior
-
-outputs_dir = "assets/"
+import json
+import time
+import storage
+import jobs
 
 st.set_page_config(page_title="Video Review - Officer Excellence in Action", layout="wide")
 st.image("img/benchmark_logo.png", width=300)
 st.title("Video Review - Officer Excellence in Action")
 st.caption("Select an officer and choose a body-worn camera video from an incident. Once the video is transcribed, our system will analyze the transcript and highlight key moments that demonstrate excellence across five performance domains. Use this tool to recognize outstanding conduct, identify coaching opportunities, and support ongoing professional development through real-world examples.")
 
-tabs = st.tabs(["👮 Officer Summary", "📺 Manage Videos", "➕ Add New Video"])
-# Load existing data or initialize a new dictionary
-def load_data():
-    try:
-        with open(f'{outputs_dir}officers_data.json', 'r') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        data = {}
-    return data
-
-# Save the data back to a JSON file
-def save_data(data):
-    with open(f'{outputs_dir}officers_data.json', 'w') as file:
-        json.dump(data, file, indent=4)
+tabs = st.tabs(["👮 Officer Summary", "📺 Manage Videos", "➕ Add New Video", "🔎 Search"])
+
+# Pipeline jobs run on background worker threads shared by every session of this server
+@st.cache_resource
+def start_job_workers():
+    jobs.start_workers(num_workers=2)
+
+start_job_workers()
+
+@st.cache_data
+def load_domain_descriptions():
+    with open("extras/domain_descriptions.json", "r") as f:
+        return json.load(f)
+
+# Poll a queued or running job and rerun the page once it has finished
+@st.fragment(run_every=0.5)
+def job_progress(job_id):
+    job = jobs.get_job(job_id)
+    if job["status"] in jobs.ACTIVE:
+        st.progress(job["progress"] or 0.0, text=job["message"])
+        if job["partial"]:
+            with st.container(border=True):
+                st.markdown(job["partial"])
+    else:
+        st.rerun()
 
 with tabs[0]:
     st.subheader("Officer Behavior Summary")
     st.caption("Select an officer to review a summary of behavior evaluations across all uploaded videos, categorized by performance area.")
-    officer_data = load_data()
+    officers = storage.list_officers()
 
 
     show_descriptions = st.toggle("Show Excellence Domain Descriptions")
 
     if show_descriptions:
         try:
-            with open("extras/domain_descriptions.json", "r") as f:
-                descriptions = json.load(f)
+            descriptions = load_domain_descriptions()
             st.markdown("### 📘 Excellence Domain Descriptions")
             for cat, desc in descriptions.items():
                 with st.expander(cat):
@@ -47,70 +57,47 @@ with tabs[0]:
     col1, col2 = st.columns([1, 2])
     with col1:
 
-        summary_officer_name = st.selectbox("Select Officer", options=[""] + list(officer_data.keys()), key="summary_select")
+        summary_officer_name = st.selectbox("Select Officer", options=[""] + officers, key="summary_select")
 
         # Domains and Subdomains
-        domain_subdomains = {
-            "Maximum Engagement": ["Calls for Service", "Arrests", "Time to Engage", "Self-initiated / Proactive"],
-            "Minimal Harm": ["Officer Injury Avoidance", "Citizen Injury Avoidance", "External Complaint Reduction", "Citizen Recognition"],
-            "Disciplined Conduct": ["Attendance", "Infractions", "Accidents"],
-            "Team Player": ["Showing Up First", "Showing Up for Team", "Balance of Call Types"],
-            "Skillful Actions": ["Time to Resolve", "De-escalation", "Force Avoidance"]
-        }
-
-        selected_domain = st.selectbox("Select Domain (Required)", [""] + list(domain_subdomains.keys()))
+        domain_subdomains = storage.DOMAIN_SUBDOMAINS
+
+        # Evaluation counts per (domain, subdomain), for the selected officer or across all officers
+        counts = storage.domain_counts(summary_officer_name or None)
+
+        def domain_label(domain):
+            if not domain:
+                return domain
+            total = sum(count for (d, _), count in counts.items() if d == domain)
+            return f"{domain} ({total})"
+
+        selected_domain = st.selectbox("Select Domain (Required)", [""] + list(domain_subdomains.keys()), format_func=domain_label)
         selected_subdomains = []
 
         if selected_domain:
             selected_subdomains = st.multiselect(
                 "Select Subdomains (Required)",
-                options=domain_subdomains[selected_domain]
+                options=domain_subdomains[selected_domain],
+                format_func=lambda subdomain: f"{subdomain} ({counts.get((selected_domain, subdomain), 0)})"
             )
 
     with col2:
         if summary_officer_name and selected_domain and selected_subdomains:
             evaluations = []
 
-            for video in officer_data.get(summary_officer_name, []):
-                evaluation = video.get("evaluation", "")
-                if evaluation:
-                    lines = evaluation.splitlines()
-                    current_eval = {}
-                    all_evals = []
-
-                    for line in lines:
-                        if line.startswith("**Domain**:"):
-                            current_eval["domain"] = line.replace("**Domain**:", "").strip()
-                        elif line.startswith("**Subdomain**:"):
-                            current_eval["subdomain"] = line.replace("**Subdomain**:", "").strip()
-                        elif line.startswith("**Quote**:"):
-                            current_eval["quote"] = line.replace("**Quote**:", "").strip()
-                        elif line.startswith("**Summary**:"):
-                            current_eval["summary"] = line.replace("**Summary**:", "").strip()
-                        elif line.startswith("**Reference**:"):
-                            current_eval["reference"] = line.replace("**Reference**:", "").strip()
-                            all_evals.append(current_eval)
-                            current_eval = {}
-
-                    for ev in all_evals:
-                        if ev["domain"] == selected_domain and ev["subdomain"] in selected_subdomains:
-                            match = re.search(r'\((.*?)\)', ev['reference'])
-                            if match:
-                                timing = match.group(1).split('-')[0].strip().replace('s', '')
-                            else:
-                                timing = "0" # fallback
-                            summary_text = (
-                                f"**Quote**: \"{ev['quote']}\"\n\n"
-                                f"**Summary**: {ev['summary']}\n\n"
-                                f"**Reference**: {ev['reference']}"
-                            )
-                            evaluations.append({
-                                "subdomain": ev["subdomain"],
-                                "title": video["title"],
-                                "summary": summary_text,
-                                "video": video["url"],
-                                "start_time": timing
-                            })
+            for ev in storage.get_evaluations(summary_officer_name, selected_domain, selected_subdomains):
+                summary_text = (
+                    f"**Quote**: \"{ev['quote']}\"\n\n"
+                    f"**Summary**: {ev['summary']}\n\n"
+                    f"**Reference**: {ev['reference']}"
+                )
+                evaluations.append({
+                    "subdomain": ev["subdomain"],
+                    "title": ev["title"],
+                    "summary": summary_text,
+                    "video": ev["url"],
+                    "start_time": ev["start_time"]
+                })
 
             if evaluations:
                 st.markdown(f"### 🏅 {selected_domain}")
@@ -140,24 +127,26 @@ with tabs[0]:
 
 
 with tabs[1]:
-    officer_data = load_data()
+    officers = storage.list_officers()
     st.subheader("Manage Officer Video and Generate Insights")
     st.caption("Use this tab to select an officer, view their body cam footage, generate transcripts, segment dialogue, and evaluate behavior—all in one streamlined workflow with data saved automatically.")
 
-    officer_name = st.selectbox("Select Officer", options=[""] + list(officer_data.keys()))
+    officer_name = st.selectbox("Select Officer", options=[""] + officers)
 
     selected_video_url = ""
     selected_video_transcript = ""
     selected_video_segments = ""
     selected_video_evaluation = ""
+    selected_video_metrics = {}
 
     if officer_name:
-        if officer_data.get(officer_name):
-            video_titles = [f"{video['title']} - {video['url']}" for video in officer_data[officer_name]]
+        officer_videos = storage.get_videos(officer_name)
+        if officer_videos:
+            video_titles = [f"{video['title']} - {video['url']}" for video in officer_videos]
             selected_video = st.selectbox("Select Video", options=[""] + video_titles)
 
             selected_video_entry = next(
-                (video for video in officer_data[officer_name]
+                (video for video in officer_videos
                  if f"{video['title']} - {video['url']}" == selected_video),
                 None
             )
@@ -167,6 +156,7 @@ with tabs[1]:
                 selected_video_transcript = selected_video_entry.get('transcript', '')
                 selected_video_segments = selected_video_entry.get('segments', '')
                 selected_video_evaluation = selected_video_entry.get('evaluation', '')
+                selected_video_metrics = selected_video_entry.get('metrics', {})
 
     if selected_video_url:
         col1, col2 = st.columns([1.3, 1.7])
@@ -184,6 +174,54 @@ with tabs[1]:
             )
 
         with col2:
+            video_job = jobs.latest_job(officer_name, selected_video_url)
+            job_running = video_job is not None and video_job["status"] in jobs.ACTIVE
+            if job_running:
+                job_progress(video_job["id"])
+            elif video_job is not None and video_job["status"] == "failed":
+                st.error(f"Generating the {video_job['stage']} failed: {video_job['error']}")
+
+            if selected_video_metrics:
+                with st.expander("⏱️ Processing Cost & Latency", expanded=False):
+                    total_cost = sum(summary["cost_usd"] for summary in selected_video_metrics.values())
+                    st.caption(f"Estimated API cost for this video: ${total_cost:.4f}")
+                    uploaded = sum(summary.get("counts", {}).get("upload_bytes", 0) for summary in selected_video_metrics.values())
+                    saved = sum(summary.get("counts", {}).get("bytes_saved", 0) for summary in selected_video_metrics.values())
+                    if uploaded:
+                        st.caption(
+                            f"Audio uploaded: {uploaded / 2**20:.2f} MB"
+                            + (f" ({saved / 2**20:.2f} MB saved by in-memory chunks)" if saved else "")
+                        )
+                    st.dataframe(
+                        [
+                            {"Stage": stage, "Step": step, "Seconds": seconds}
+                            for stage, summary in selected_video_metrics.items()
+                            for step, seconds in [("total", summary["wall_s"])] + list(summary["stages"].items())
+                        ],
+                        hide_index=True
+                    )
+                    st.dataframe(
+                        [
+                            {
+                                "Stage": stage,
+                                "API": kind,
+                                "Requests": requests["requests"],
+                                "Cached": requests["cached"],
+                                "Retries": requests["retries"],
+                                "Errors": requests["errors"],
+                                "p50 (s)": requests["latency_p50_s"],
+                                "p95 (s)": requests["latency_p95_s"],
+                                "Prompt tokens": requests["prompt_tokens"],
+                                "Completion tokens": requests["completion_tokens"],
+                                "Audio (min)": round(requests["audio_seconds"] / 60, 1),
+                                "Cost ($)": requests["cost_usd"],
+                            }
+                            for stage, summary in selected_video_metrics.items()
+                            for kind, requests in summary["requests"].items()
+                        ],
+                        hide_index=True
+                    )
+
             if selected_video_transcript:
                 formatted_transcript = "\n".join(selected_video_transcript)
 
@@ -193,6 +231,9 @@ with tabs[1]:
                         formatted_transcript,
                         height=280
                     )
+                    if st.button("Regenerate Transcript", disabled=job_running):
+                        jobs.enqueue(officer_name, selected_video_url, "transcript", refresh=True)
+                        st.rerun()
 
                 if selected_video_segments:
                     with st.expander("🧩 Segmented Transcript", expanded=False):
@@ -201,6 +242,9 @@ with tabs[1]:
                             selected_video_segments,
                             height=280
                         )
+                        if st.button("Regenerate Segments", disabled=job_running):
+                            jobs.enqueue(officer_name, selected_video_url, "segments", refresh=True)
+                            st.rerun()
 
                     if selected_video_evaluation:
                         with st.expander("🔍 Officer Behavior Evaluation", expanded=False):
@@ -209,52 +253,23 @@ with tabs[1]:
                                 selected_video_evaluation,
                                 height=280
                             )
-                    else:
-                        if st.button("Evaluate Officer Behavior"):
-                            with st.spinner("Evaluating officer behavior..."):
-                                evaluation = evaluate_officer_behavior(selected_video_segments)
-                                with st.expander("🔍 Officer Behavior Evaluation", expanded=False):
-                                    st.text_area("Evaluation", evaluation, height=300)
-                                for video in officer_data[officer_name]:
-                                    if video['url'] == selected_video_url:
-                                        video['evaluation'] = evaluation
-                                        break
-                                save_data(officer_data)
+                            if st.button("Regenerate Evaluation", disabled=job_running):
+                                jobs.enqueue(officer_name, selected_video_url, "evaluation", refresh=True)
                                 st.rerun()
+                    else:
+                        if st.button("Evaluate Officer Behavior", disabled=job_running):
+                            jobs.enqueue(officer_name, selected_video_url, "evaluation")
+                            st.rerun()
 
                 else:
-                    if st.button("Segment Transcript"):
-                        with st.spinner("Segmenting transcript..."):
-                            segments = segment_transcript(selected_video_transcript)
-                            with st.expander("🧩 Segmented Transcript", expanded=False):
-                                st.text_area(
-                                    "*Segments are generated by Artificial Intelligence. You may directly edit copy to ensure the summarized segments match with the observed behavior.",
-                                    segments,
-                                    height=280
-                                )
-                            for video in officer_data[officer_name]:
-                                if video['url'] == selected_video_url:
-                                    video['segments'] = segments
-                                    break
-                            save_data(officer_data)
-                            st.rerun()
+                    if st.button("Segment Transcript", disabled=job_running):
+                        jobs.enqueue(officer_name, selected_video_url, "segments")
+                        st.rerun()
 
             else:
-                if st.button("Generate Transcript"):
-                    with st.spinner("Transcripting... Please wait."):
-                        transcriptions = summarize_youtube_video(selected_video_url, outputs_dir)
-                        with st.expander("📝 Existing Transcript", expanded=False):
-                            st.text_area(
-                                "*Transcripts are generated by Artificial Intelligence. You may directly edit copy to ensure the transcript matches with the observed behavior.",
-                                transcriptions,
-                                height=280
-                            )
-                        for video in officer_data[officer_name]:
-                            if video['url'] == selected_video_url:
-                                video['transcript'] = transcriptions
-                                break
-                        save_data(officer_data)
-                        st.rerun()
+                if st.button("Generate Transcript", disabled=job_running):
+                    jobs.enqueue(officer_name, selected_video_url, "transcript")
+                    st.rerun()
 
 with tabs[2]:
     st.subheader("Add a New Officer Video")
@@ -270,16 +285,7 @@ with tabs[2]:
 
     if st.button("Add Video"):
         if new_officer and new_video_url and new_video_title:
-            new_entry = {
-                "title": new_video_title,
-                "url": new_video_url
-            }
-            officer_data = load_data()  # Reload in case of updates from other tab
-            if new_officer in officer_data:
-                officer_data[new_officer].append(new_entry)
-            else:
-                officer_data[new_officer] = [new_entry]
-            save_data(officer_data)
+            storage.add_video(new_officer, new_video_title, new_video_url)
             st.session_state.video_added = True
             st.rerun()
         else:
@@ -289,3 +295,46 @@ with tabs[2]:
     if st.session_state.get("video_added", False):
         st.success(f"Video added for Officer '{new_officer}'!")
         st.session_state.video_added = False
+
+with tabs[3]:
+    st.subheader("Search Transcripts & Evaluations")
+    st.caption("Find a phrase across every officer's transcripts and evaluation quotes. Put a phrase in quotes to match it exactly, and pick a hit to play the video from that moment.")
+
+    search_col1, search_col2 = st.columns([2, 1])
+    with search_col1:
+        search_text = st.text_input("Search", placeholder='e.g. taser deployment or "get on the ground"')
+    with search_col2:
+        search_officer = st.selectbox("Officer", options=["All officers"] + storage.list_officers(), key="search_officer")
+
+    if search_text:
+        search_start = time.perf_counter()
+        hits = storage.search(search_text, officer=None if search_officer == "All officers" else search_officer)
+        st.caption(f"{len(hits)} hits in {(time.perf_counter() - search_start) * 1000:.0f} ms")
+
+        if hits:
+            col1, col2 = st.columns([1.7, 1.3])
+            with col1:
+                selected_hit = st.radio(
+                    "Hits",
+                    options=range(len(hits)),
+                    format_func=lambda i: f"{'📝' if hits[i]['kind'] == 'transcript' else '💬'} "
+                                          f"{hits[i]['officer']} — {hits[i]['title']} [{hits[i]['start_time']}s]",
+                    label_visibility="collapsed",
+                    key="search_hit"
+                )
+            with col2:
+                hit = hits[selected_hit or 0]
+                st.markdown(f"**{hit['officer']}** — {hit['title']} at {hit['start_time']}s")
+                st.markdown(hit["snippet"])
+                components.html(
+                    f"""
+                    <div style="text-align:left;">
+                        <iframe width="560" height="315"
+                        src="{hit['url'].replace('watch?v=', 'embed/')}?start={hit['start_time']}"
+                        frameborder="0" allowfullscreen></iframe>
+                    </div>
+                    """,
+                    height=330
+                )
+        else:
+            st.info("No transcript lines or evaluation quotes match your search.")
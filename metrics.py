@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+METRICS_LOG = os.getenv("METRICS_LOG", "logs/metrics.jsonl")
+METRICS_PROMETHEUS = os.getenv("METRICS_PROMETHEUS")
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+# USD, per audio minute for transcription and per 1K tokens for chat
+PRICES = {
+    "whisper-1": {"audio_minute": 0.006},
+    "gpt-3.5-turbo": {"prompt": 0.0005, "completion": 0.0015},
+}
+
+_current_run = contextvars.ContextVar("metrics_run", default=None)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q / 100 * (len(values) - 1)))] if values else 0.0
+
+
+def request_cost(model, prompt_tokens=0, completion_tokens=0, audio_seconds=0.0) -> float:
+    prices = PRICES.get(model, {})
+    return (
+        prices.get("audio_minute", 0.0) * audio_seconds / 60
+        + prices.get("prompt", 0.0) * prompt_tokens / 1000
+        + prices.get("completion", 0.0) * completion_tokens / 1000
+    )
+
+
+class Run:
+    """Stage timings and API requests recorded while processing one video."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.stages = {}
+        self.requests = []
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_count(self, name, amount):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def add_request(self, request):
+        with self._lock:
+            self.requests.append(request)
+
+    def summary(self) -> dict:
+        with self._lock:
+            requests = list(self.requests)
+            stages = dict(self.stages)
+            counts = dict(self.counts)
+
+        by_kind = {}
+        for request in requests:
+            kind = by_kind.setdefault(request["kind"], {
+                "requests": 0, "cached": 0, "errors": 0, "retries": 0, "latencies": [],
+                "prompt_tokens": 0, "completion_tokens": 0, "audio_seconds": 0.0, "cost_usd": 0.0,
+            })
+            kind["requests"] += 1
+            kind["cached"] += request["cached"]
+            kind["errors"] += request["error"] is not None
+            kind["retries"] += request["retries"]
+            kind["prompt_tokens"] += request["prompt_tokens"]
+            kind["completion_tokens"] += request["completion_tokens"]
+            kind["audio_seconds"] += request["audio_seconds"]
+            kind["cost_usd"] += request["cost_usd"]
+            if not request["cached"]:
+                kind["latencies"].append(request["latency"])
+
+        for kind in by_kind.values():
+            latencies = kind.pop("latencies")
+            kind["latency_p50_s"] = round(_percentile(latencies, 50), 3)
+            kind["latency_p95_s"] = round(_percentile(latencies, 95), 3)
+            kind["latency_max_s"] = round(max(latencies, default=0.0), 3)
+            kind["audio_seconds"] = round(kind["audio_seconds"], 1)
+            kind["cost_usd"] = round(kind["cost_usd"], 5)
+
+        return {
+            "name": self.name,
+            "started": self.started,
+            "wall_s": round(time.time() - self.started, 3),
+            "stages": {stage: round(seconds, 3) for stage, seconds in stages.items()},
+            "requests": by_kind,
+            "counts": counts,
+            "cost_usd": round(sum(kind["cost_usd"] for kind in by_kind.values()), 5),
+        }
+
+
+class Registry:
+    """Process-wide totals, exported in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = {}
+        self.stage_count = {}
+        self.request_buckets = {}
+        self.request_count = {}
+        self.request_seconds = {}
+        self.counters = {}
+        self.counts = {}
+
+    def add_stage(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_count[stage] = self.stage_count.get(stage, 0) + 1
+
+    def add_count(self, name, amount):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def add_request(self, request):
+        key = (request["kind"], request["model"])
+        with self._lock:
+            for name in ("retries", "prompt_tokens", "completion_tokens", "audio_seconds", "cost_usd", "cached"):
+                self.counters[(name, key)] = self.counters.get((name, key), 0) + request[name]
+            self.counters[("errors", key)] = self.counters.get(("errors", key), 0) + (request["error"] is not None)
+            if request["cached"]:
+                return
+            buckets = self.request_buckets.setdefault(key, [0] * len(LATENCY_BUCKETS))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if request["latency"] <= bound:
+                    buckets[i] += 1
+            self.request_count[key] = self.request_count.get(key, 0) + 1
+            self.request_seconds[key] = self.request_seconds.get(key, 0.0) + request["latency"]
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self._lock:
+            lines.append("# TYPE pipeline_stage_seconds summary")
+            for stage, seconds in sorted(self.stage_seconds.items()):
+                lines.append(f'pipeline_stage_seconds_sum{{stage="{stage}"}} {seconds}')
+                lines.append(f'pipeline_stage_seconds_count{{stage="{stage}"}} {self.stage_count[stage]}')
+
+            lines.append("# TYPE openai_request_seconds histogram")
+            for (kind, model), buckets in sorted(self.request_buckets.items()):
+                labels = f'kind="{kind}",model="{model}"'
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    le = "+Inf" if bound == float("inf") else bound
+                    lines.append(f'openai_request_seconds_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"openai_request_seconds_sum{{{labels}}} {self.request_seconds[(kind, model)]}")
+                lines.append(f"openai_request_seconds_count{{{labels}}} {self.request_count[(kind, model)]}")
+
+            for name in ("retries", "errors", "cached", "prompt_tokens", "completion_tokens", "audio_seconds", "cost_usd"):
+                lines.append(f"# TYPE openai_{name}_total counter")
+                for (counter, (kind, model)), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(f'openai_{name}_total{{kind="{kind}",model="{model}"}} {value}')
+
+            for name, value in sorted(self.counts.items()):
+                lines.append(f"# TYPE pipeline_{name}_total counter")
+                lines.append(f"pipeline_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+@contextmanager
+def track(name):
+    """Collect the metrics of everything run inside the block (including worker threads started via submit)."""
+    run = Run(name)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+        export(run.summary())
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.add_stage(name, seconds)
+        run = _current_run.get()
+        if run is not None:
+            run.add_stage(name, seconds)
+
+
+def timed(name):
+    """Decorator that times every call of a function as the stage name."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1):
+    """Add amount to a named pipeline counter, such as upload_bytes."""
+    registry.add_count(name, amount)
+    run = _current_run.get()
+    if run is not None:
+        run.add_count(name, amount)
+
+
+def record_request(kind, model, latency, retries=0, prompt_tokens=0, completion_tokens=0, audio_seconds=0.0, cached=False, error=None):
+    """Record one OpenAI call (or cache hit) with its latency, retries, token usage and audio length."""
+    request = {
+        "kind": kind,
+        "model": model,
+        "latency": latency,
+        "retries": retries,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "audio_seconds": audio_seconds,
+        "cached": cached,
+        "error": error,
+        "cost_usd": 0.0 if cached else request_cost(model, prompt_tokens, completion_tokens, audio_seconds),
+    }
+    registry.add_request(request)
+    run = _current_run.get()
+    if run is not None:
+        run.add_request(request)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit that carries the current metrics run over to the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def export(summary):
+    """Append a run summary to the JSON log and refresh the Prometheus text file, if configured."""
+    if METRICS_LOG:
+        if os.path.dirname(METRICS_LOG):
+            os.makedirs(os.path.dirname(METRICS_LOG), exist_ok=True)
+        with open(METRICS_LOG, "a") as file:
+            file.write(json.dumps(summary) + "\n")
+    if METRICS_PROMETHEUS:
+        tmp_path = f"{METRICS_PROMETHEUS}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(registry.prometheus_text())
+        os.replace(tmp_path, METRICS_PROMETHEUS)
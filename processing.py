@@ -1,14 +1,42 @@
+import io
 import os
+import re
+import json
+import math
+import fcntl
 import shutil
-import librosa
+import time
+import hashlib
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import soundfile as sf
-from yt_dlp import YoutubeDL, DownloadError
 from dotenv import load_dotenv
-from openai import OpenAI
+from cache import make_key, transcription_cache, completion_cache
+import metrics
+import ratelimit
+from storage import DOMAIN_SUBDOMAINS
+
+# librosa, yt_dlp and openai take seconds to import, so they are imported where they are first used
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The OpenAI client, created on first use."""
+    global client
+    with _client_lock:
+        if client is None:
+            from openai import OpenAI
+            # retries go through call_openai so rate limits are seen by the shared limiter
+            client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+    return client
 
 
 def find_audio_files(path, extension=".mp3"):
@@ -20,8 +48,91 @@ def find_audio_files(path, extension=".mp3"):
                 audio_files.append(os.path.join(root, f))
     return audio_files
 
-def youtube_to_mp3(youtube_url: str, output_dir: str) -> str:
-    """Download the audio from a YouTube video, save it to output_dir as an .mp3 file."""
+def video_id(youtube_url: str) -> str:
+    """Canonical id of a video: the YouTube video id, or a hash of the URL for other sources."""
+    match = re.search(r"(?:[?&]v=|youtu\.be/|/embed/|/shorts/|/live/)([A-Za-z0-9_-]{11})", youtube_url)
+    if match:
+        return match.group(1)
+    return hashlib.sha1(youtube_url.strip().encode("utf-8")).hexdigest()[:12]
+
+def read_manifest(path, **expected):
+    """Load a workspace manifest, or None if it is missing, was made with other parameters, or lists missing files."""
+    try:
+        with open(path, "r") as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if any(manifest.get(key) != value for key, value in expected.items()):
+        return None
+    directory = os.path.dirname(path)
+    for f in manifest.get("files", []):
+        file_path = os.path.join(directory, f)
+        if not os.path.isfile(file_path) or os.path.getsize(file_path) == 0:
+            return None
+    return manifest
+
+def write_manifest(path, manifest):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(tmp_path, path)
+
+_workspace_locks = {}
+_workspace_locks_lock = threading.Lock()
+
+@contextmanager
+def workspace_lock(workspace):
+    """Hold a video workspace for one run at a time, across threads (a lock per workspace) and processes (a lock file)."""
+    with _workspace_locks_lock:
+        lock = _workspace_locks.setdefault(os.path.abspath(workspace), threading.Lock())
+    with lock:
+        os.makedirs(workspace, exist_ok=True)
+        with open(os.path.join(workspace, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# MP3 bitrate for in-memory chunks: 0.9 is about 20 kbps at 16 kHz mono, plenty for speech recognition.
+# (libsndfile's Opus encoder gives similar sizes but is about five times slower.)
+CHUNK_COMPRESSION = 0.9
+
+def encode_chunk(segment, sr) -> bytes:
+    """Encode a mono chunk as low-bitrate MP3 in memory."""
+    buffer = io.BytesIO()
+    sf.write(buffer, segment, sr, format="MP3", compression_level=CHUNK_COMPRESSION)
+    return buffer.getvalue()
+
+def save_chunk(segment, sr, index, output_dir=None):
+    """Write chunk index to output_dir and return its path.
+
+    Without output_dir the chunk stays in memory and (filename, mp3 bytes) is
+    returned instead, ready to be passed to the transcription API as is.
+    """
+    name = f"segment_{index:05d}.mp3"
+    if output_dir is None:
+        return (name, encode_chunk(segment, sr))
+    segment_file = os.path.join(output_dir, name)
+    sf.write(segment_file, segment, sr)
+    return segment_file
+
+# bitrate in kbps of the MP3 the downloaded audio is converted to
+DOWNLOAD_KBPS = 192
+
+@metrics.timed("download")
+def youtube_to_mp3(youtube_url: str, output_dir: str, progress=None, filename="audio.mp3") -> str:
+    """Download the audio from a YouTube video, save it to output_dir as an .mp3 file.
+
+    The download happens in a private temporary directory and the result is moved
+    to output_dir/filename, so concurrent downloads never pick up each other's files.
+    progress, if given, is called as progress(stage, fraction, message) while downloading.
+    """
+    from yt_dlp import YoutubeDL, DownloadError
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    download_dir = tempfile.mkdtemp(prefix=".download-", dir=output_dir)
 
     ydl_config = {
         "format": "bestaudio/best",
@@ -29,75 +140,301 @@ def youtube_to_mp3(youtube_url: str, output_dir: str) -> str:
             {
                 "key": "FFmpegExtractAudio",
                 "preferredcodec": "mp3",
-                "preferredquality": "192",
+                "preferredquality": str(DOWNLOAD_KBPS),
             }
         ],
-        "outtmpl": os.path.join(output_dir, "%(title)s.%(ext)s"),
+        "outtmpl": os.path.join(download_dir, "%(id)s.%(ext)s"),
         "verbose": True,
     }
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    if progress is not None:
+        def download_hook(d):
+            if d["status"] == "downloading":
+                total = d.get("total_bytes") or d.get("total_bytes_estimate")
+                fraction = d["downloaded_bytes"] / total if total else None
+                progress("download", fraction, "Downloading audio...")
+            elif d["status"] == "finished":
+                progress("download", 1.0, "Converting audio...")
+
+        ydl_config["progress_hooks"] = [download_hook]
 
     print(f"Downloading video from {youtube_url}")
 
     try:
-        with YoutubeDL(ydl_config) as ydl:
-            ydl.download([youtube_url])
-    except DownloadError:
-        print("Initial download failed, retrying...")
-        with YoutubeDL(ydl_config) as ydl:
-            ydl.download([youtube_url])
-
-    audio_filename = find_audio_files(output_dir)[0]
+        try:
+            with YoutubeDL(ydl_config) as ydl:
+                ydl.download([youtube_url])
+        except DownloadError:
+            print("Initial download failed, retrying...")
+            with YoutubeDL(ydl_config) as ydl:
+                ydl.download([youtube_url])
+
+        audio_filename = os.path.join(output_dir, filename)
+        os.replace(find_audio_files(download_dir)[0], audio_filename)
+    finally:
+        shutil.rmtree(download_dir, ignore_errors=True)
     return audio_filename
 
 # Example usage:
 #youtube_to_mp3('https://www.youtube.com/watch?v=Tx3xJxE20uk', '/Users/pavlo.tsiselskyi/Documents/hackaton/assets/audio_files/')
 
-def chunk_audio(filename, segment_length: int, output_dir):
-    """segment lenght is in seconds"""
+@metrics.timed("chunk")
+def chunk_audio(filename, segment_length: int, output_dir=None, sr=16000, mono=True):
+    """segment lenght is in seconds
+
+    Audio is decoded block by block, one segment at a time, so memory stays
+    bounded by a single segment regardless of the recording length. Each block
+    is downmixed and resampled to sr before being written. Without output_dir
+    the chunks are kept in memory, see save_chunk.
+    """
+    import librosa
 
     print(f"Chunking audio to {segment_length} second segments...")
 
-    if not os.path.isdir(output_dir):
+    if output_dir is not None and not os.path.isdir(output_dir):
         os.mkdir(output_dir)
 
-    # load audio file
-    audio, sr = librosa.load(filename, sr=44100)
+    chunked_audio_files = []
+    with sf.SoundFile(filename) as audio:
+        native_sr = audio.samplerate
+        block_size = segment_length * native_sr
+
+        print(f"Chunking {math.ceil(audio.frames / block_size)} chunks...")
+
+        # iterate through segments and save them as they are decoded
+        for i, segment in enumerate(audio.blocks(blocksize=block_size, dtype="float32", always_2d=True)):
+            if mono:
+                segment = segment.mean(axis=1)
+            if sr != native_sr:
+                segment = librosa.resample(segment.T, orig_sr=native_sr, target_sr=sr).T
+            chunked_audio_files.append(save_chunk(segment, sr, i, output_dir))
+
+    return chunked_audio_files
+
+def frame_energies(filename, frame_duration=0.03):
+    """Return the RMS level in dB of every frame_duration-second frame of filename."""
+    levels = []
+    with sf.SoundFile(filename) as audio:
+        frame_size = max(1, int(frame_duration * audio.samplerate))
+        for block in audio.blocks(blocksize=frame_size * 1000, dtype="float32", always_2d=True):
+            block = block.mean(axis=1)
+            num_frames = math.ceil(len(block) / frame_size)
+            block = np.pad(block, (0, num_frames * frame_size - len(block)))
+            rms = np.sqrt(np.mean(block.reshape(num_frames, frame_size) ** 2, axis=1))
+            levels.append(20 * np.log10(rms + 1e-10))
+        frame_duration = frame_size / audio.samplerate
+    return (np.concatenate(levels) if levels else np.zeros(0)), frame_duration
+
+def detect_speech(levels, frame_duration, top_db=40, floor_db=-60, reference_percentile=95, min_silence=0.5, min_speech=0.2):
+    """Find speech regions as (start, end) seconds from per-frame dB levels.
+
+    A frame is speech when it is within top_db of the reference level (the
+    reference_percentile of all frame levels, so a single bang or siren does
+    not raise it) and above floor_db. Pauses shorter than min_silence are
+    bridged and isolated blips shorter than min_speech are dropped.
+    """
+    if len(levels) == 0:
+        return []
+
+    threshold = max(np.percentile(levels, reference_percentile) - top_db, floor_db)
+    voiced = np.concatenate(([False], levels > threshold, [False]))
+    edges = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+
+    regions = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        start, end = start * frame_duration, end * frame_duration
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    return [(start, end) for start, end in regions if end - start >= min_speech]
+
+def split_on_pauses(regions, levels, frame_duration, segment_length, max_gap=2.0, padding=0.25, duration=None):
+    """Pack speech regions into chunks of at most segment_length seconds.
+
+    Neighbouring regions separated by less than max_gap are merged into one
+    chunk, longer silences end the chunk and are never uploaded. Speech that
+    runs past segment_length without a pause is cut at the quietest frame in
+    the last quarter of the chunk.
+    """
+    pieces = []
+    for start, end in regions:
+        while end - start > segment_length:
+            lo = int((start + 0.75 * segment_length) / frame_duration)
+            hi = int((start + segment_length) / frame_duration)
+            cut = (lo + int(np.argmin(levels[lo:hi]))) * frame_duration if hi > lo else start + segment_length
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    chunks = []
+    for start, end in pieces:
+        if chunks and start - chunks[-1][1] <= max_gap and end - chunks[-1][0] <= segment_length:
+            chunks[-1][1] = end
+        else:
+            chunks.append([start, end])
+
+    if duration is None:
+        duration = len(levels) * frame_duration
+
+    # pad around the speech without overlapping the neighbouring chunks
+    padded = []
+    for i, (start, end) in enumerate(chunks):
+        lower = (chunks[i - 1][1] + start) / 2 if i > 0 else 0.0
+        upper = (end + chunks[i + 1][0]) / 2 if i + 1 < len(chunks) else duration
+        padded.append((float(max(lower, start - padding)), float(min(upper, end + padding))))
+    return padded
+
+@metrics.timed("chunk")
+def chunk_audio_on_silence(filename, segment_length: int, output_dir=None, sr=16000, top_db=40, max_gap=2.0, min_coverage=0.1):
+    """Chunk audio at speech pauses, skipping silence.
+
+    Returns the chunk files and their (start, end) times in seconds, which
+    transcribe_audio needs because chunks have variable length. If less than
+    min_coverage of the recording is detected as speech, detection is not
+    trusted and the whole recording is chunked. Without output_dir the chunks
+    are kept in memory, see save_chunk.
+    """
+    import librosa
 
-    # calculate duration in seconds
-    duration = librosa.get_duration(y=audio, sr=sr)
+    print(f"Chunking audio at pauses, up to {segment_length} seconds per segment...")
 
-    # calculate number of segments
-    num_segments = int(duration / segment_length) + 1
+    if output_dir is not None and not os.path.isdir(output_dir):
+        os.mkdir(output_dir)
 
-    print(f"Chunking {num_segments} chunks...")
+    levels, frame_duration = frame_energies(filename)
+    regions = detect_speech(levels, frame_duration, top_db=top_db)
+    total = len(levels) * frame_duration
+    speech = sum(end - start for start, end in regions)
+    if total and speech < min_coverage * total:
+        print(f"Only {speech:.1f}s of {total:.1f}s detected as speech, chunking the whole recording")
+        regions = [(0.0, total)]
+
+    chunked_audio_files = []
+    timestamps = []
+    with sf.SoundFile(filename) as audio:
+        native_sr = audio.samplerate
+        chunks = split_on_pauses(
+            regions, levels, frame_duration, segment_length,
+            max_gap=max_gap, duration=audio.frames / native_sr
+        )
+
+        print(f"Chunking {len(chunks)} chunks from {len(regions)} speech regions...")
+
+        for i, (start, end) in enumerate(chunks):
+            audio.seek(int(start * native_sr))
+            segment = audio.read(int((end - start) * native_sr), dtype="float32", always_2d=True).mean(axis=1)
+            if sr != native_sr:
+                segment = librosa.resample(segment, orig_sr=native_sr, target_sr=sr)
+            chunked_audio_files.append(save_chunk(segment, sr, i, output_dir))
+            timestamps.append((start, end))
+
+    return chunked_audio_files, timestamps
+
+def call_openai(kind, model, create, tokens=0, max_retries=3, retry_delay=2.0):
+    """Call create() once the shared rate limiter of kind allows it, retrying on failure.
+
+    Rate limit responses pause every caller of the same kind for the
+    retry-after delay, connection errors, timeouts and server errors are
+    retried with exponential backoff and anything else fails right away.
+    Returns (response, retries, latency of the successful attempt).
+    """
+    from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+    limiter = ratelimit.limiter(kind)
+    for attempt in range(max_retries + 1):
+        limiter.acquire(tokens)
+        start = time.perf_counter()
+        try:
+            response = create()
+        except Exception as e:
+            if isinstance(e, RateLimitError):
+                limiter.backoff(ratelimit.retry_after(e))
+            retryable = isinstance(e, (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError))
+            if attempt == max_retries or not retryable:
+                metrics.record_request(kind, model, time.perf_counter() - start, retries=attempt, error=type(e).__name__)
+                raise
+            print(f"OpenAI {kind} request failed ({e}), retrying...")
+            if not isinstance(e, RateLimitError):
+                time.sleep(retry_delay * (2 ** attempt))
+            continue
+        limiter.success()
+        return response, attempt, time.perf_counter() - start
+
+def transcribe_chunk(audio_file, model="whisper-1", max_retries=3, retry_delay=2.0, use_cache=True, refresh=False) -> str:
+    """Send one audio chunk to Whisper, retrying only this chunk on failure.
+
+    audio_file is a chunk path or an in-memory chunk from save_chunk. Results
+    are cached by a hash of the chunk and the model, so identical audio is
+    only ever transcribed once; refresh=True skips the lookup but stores the
+    new result.
+    """
+    if isinstance(audio_file, tuple):
+        audio_name, audio_bytes = audio_file
+    else:
+        with open(audio_file, "rb") as audio:
+            audio_bytes = audio.read()
+        audio_name = os.path.basename(audio_file)
+    audio_seconds = sf.info(io.BytesIO(audio_bytes)).duration
+
+    cache_key = make_key(model, audio_bytes)
+    if use_cache and not refresh:
+        cached = transcription_cache.get(cache_key)
+        if cached is not None:
+            metrics.record_request("transcription", model, 0.0, audio_seconds=audio_seconds, cached=True)
+            return cached
+
+    whisper_response, retries, latency = call_openai(
+        "transcription", model,
+        lambda: get_client().audio.transcriptions.create(model=model, file=(audio_name, audio_bytes)),
+        max_retries=max_retries, retry_delay=retry_delay
+    )
+    metrics.count("upload_bytes", len(audio_bytes))
+    metrics.record_request("transcription", model, latency, retries=retries, audio_seconds=audio_seconds)
+    if use_cache:
+        transcription_cache.set(cache_key, whisper_response.text)
+    return whisper_response.text
+
+@metrics.timed("transcribe")
+def transcribe_audio(audio_files: list, output_file=None, model="whisper-1", segment_length=20, max_workers=8, max_retries=3, timestamps=None, use_cache=True, refresh=False, progress=None) -> list:
+    """Transcribe chunks concurrently, at most max_workers requests in flight.
+
+    Set max_workers=1 to send the chunks one at a time. timestamps is an
+    optional list of (start, end) seconds per chunk, for chunks that are not
+    segment_length long; otherwise chunk i covers i * segment_length onwards.
+    progress, if given, is called as progress(stage, fraction, message) after every chunk.
+    """
+    print(f"Converting audio to text with {max_workers} workers...")
 
-    # iterate through segments and save them
-    for i in range(num_segments):
-        start = i * segment_length * sr
-        end = (i + 1) * segment_length * sr
-        segment = audio[start:end]
-        sf.write(os.path.join(output_dir, f"segment_{i}.mp3"), segment, sr)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            metrics.submit(
+                executor, transcribe_chunk, audio_file,
+                model=model, max_retries=max_retries, use_cache=use_cache, refresh=refresh
+            )
+            for audio_file in audio_files
+        ]
+        if progress is not None:
+            for done, _ in enumerate(as_completed(futures), 1):
+                progress("transcribe", done / len(futures), f"Transcribed {done}/{len(futures)} chunks")
+        raw_transcripts = [future.result() for future in futures]
 
-    chunked_audio_files = find_audio_files(output_dir)
-    return sorted(chunked_audio_files)
+    stats = transcription_cache.stats()
+    print(f"Transcription cache: {stats['hits']} hits, {stats['misses']} misses")
 
-def transcribe_audio(audio_files: list, output_file=None, model="whisper-1", segment_length=20) -> list:
-    print("Converting audio to text...")
+    return label_transcripts(raw_transcripts, segment_length=segment_length, timestamps=timestamps, output_file=output_file)
 
+def label_transcripts(raw_transcripts: list, segment_length=20, timestamps=None, output_file=None) -> list:
+    """Prefix every chunk transcript with its [start - end] time, optionally writing them to output_file."""
     transcripts = []
-    for i, audio_file in enumerate(audio_files):
-        start_time = i * segment_length
-        end_time = start_time + segment_length
-
-        with open(audio_file, "rb") as audio:
-            whisper_response = client.audio.transcriptions.create(
-                model=model,
-                file=audio
-            )
-            raw_transcript = whisper_response.text
+    for i, raw_transcript in enumerate(raw_transcripts):
+        if timestamps is not None:
+            start_time = math.floor(timestamps[i][0])
+            end_time = math.ceil(timestamps[i][1])
+        else:
+            start_time = i * segment_length
+            end_time = start_time + segment_length
 
         transcript_with_timestamp = f"[{start_time}s - {end_time}s]: {raw_transcript}"
         transcripts.append(transcript_with_timestamp)
@@ -109,41 +446,367 @@ def transcribe_audio(audio_files: list, output_file=None, model="whisper-1", seg
 
     return transcripts
 
-def summarize_youtube_video(youtube_url, outputs_dir):
-    raw_audio_dir = f"{outputs_dir}/raw_audio/"
-    chunks_dir = f"{outputs_dir}/chunks"
-    transcripts_file = f"{outputs_dir}/transcripts.txt"
-    segment_length = 20  # chunk to 20 seconds
+def stream_youtube_audio(youtube_url: str, segment_length: int, sr=16000):
+    """Yield mono float32 blocks of segment_length seconds while the audio is still downloading.
 
-    if os.path.exists(outputs_dir):
-        shutil.rmtree(outputs_dir)
-        os.mkdir(outputs_dir)
+    yt-dlp only resolves the audio stream URL; ffmpeg fetches and decodes it
+    progressively, so the first block is available after segment_length
+    seconds of audio have arrived rather than after the whole download.
+    """
+    from yt_dlp import YoutubeDL
 
-    audio_filename = youtube_to_mp3(youtube_url, output_dir=raw_audio_dir)
+    with YoutubeDL({"format": "bestaudio/best", "quiet": True}) as ydl:
+        info = ydl.extract_info(youtube_url, download=False)
 
-    chunked_audio_files = chunk_audio(
-        audio_filename, segment_length=segment_length, output_dir=chunks_dir
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    if info.get("http_headers") and info["url"].startswith("http"):
+        command += ["-headers", "".join(f"{key}: {value}\r\n" for key, value in info["http_headers"].items())]
+    command += ["-i", info["url"], "-f", "s16le", "-ac", "1", "-ar", str(sr), "pipe:1"]
+
+    block_bytes = segment_length * sr * 2
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if len(data) < 2:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype="<i2").astype(np.float32) / 32768
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {youtube_url}: {process.stderr.read().decode().strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+@metrics.timed("stream")
+def transcribe_youtube_stream(youtube_url, workspace, segment_length=20, sr=16000, model="whisper-1", max_workers=8, max_retries=3, progress=None, in_memory=False, refresh=False) -> list:
+    """Chunk and transcribe a video in one pipeline: every chunk goes to a
+    transcription worker as soon as it has been decoded, while the rest is
+    still downloading.
+
+    Chunks are fixed-length (silence detection needs the whole recording) and
+    are saved to workspace/chunks with the same manifest as summarize_youtube_video,
+    or with in_memory=True only kept in memory as compact buffers.
+    """
+    print(f"Streaming audio from {youtube_url} into {segment_length} second chunks...")
+
+    chunks_dir = os.path.join(workspace, "chunks")
+    os.makedirs(workspace, exist_ok=True)
+    tmp_chunks_dir = None if in_memory else tempfile.mkdtemp(prefix=".chunks-", dir=workspace)
+
+    chunked_audio_files = []
+    futures = []
+    decoded_seconds = 0.0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for i, segment in enumerate(stream_youtube_audio(youtube_url, segment_length, sr=sr)):
+                segment_file = save_chunk(segment, sr, i, tmp_chunks_dir)
+                chunked_audio_files.append(segment_file)
+                decoded_seconds += len(segment) / sr
+                futures.append(metrics.submit(
+                    executor, transcribe_chunk, segment_file, model=model, max_retries=max_retries, refresh=refresh
+                ))
+                if progress is not None:
+                    done = sum(future.done() for future in futures)
+                    progress("transcribe", None, f"Received {len(futures)} chunks, transcribed {done}")
+
+            if progress is not None:
+                for done, _ in enumerate(as_completed(futures), 1):
+                    progress("transcribe", done / len(futures), f"Transcribed {done}/{len(futures)} chunks")
+            raw_transcripts = [future.result() for future in futures]
+    except Exception:
+        if tmp_chunks_dir is not None:
+            shutil.rmtree(tmp_chunks_dir, ignore_errors=True)
+        raise
+
+    if in_memory:
+        report_bytes_saved(chunked_audio_files, duration=decoded_seconds)
+        return label_transcripts(
+            raw_transcripts, segment_length=segment_length, output_file=os.path.join(workspace, "transcripts.txt")
+        )
+
+    write_manifest(os.path.join(tmp_chunks_dir, "chunks.json"), {
+        "method": "fixed",
+        "segment_length": segment_length,
+        "files": [os.path.basename(f) for f in chunked_audio_files],
+        "timestamps": None,
+    })
+    if os.path.exists(chunks_dir):
+        shutil.rmtree(chunks_dir)
+    os.replace(tmp_chunks_dir, chunks_dir)
+
+    return label_transcripts(
+        raw_transcripts, segment_length=segment_length, output_file=os.path.join(workspace, "transcripts.txt")
     )
 
-    transcriptions = transcribe_audio(
-        chunked_audio_files, output_file=transcripts_file, segment_length=segment_length
+def report_bytes_saved(chunks, audio_filename=None, timestamps=None, duration=None):
+    """Compare the size of in-memory chunks with the downloaded audio they cover, and record the difference.
+
+    Streaming has no downloaded file, so there the decoded duration of the
+    chunks is compared with the DOWNLOAD_KBPS MP3 a download would have made.
+    """
+    if audio_filename is None:
+        source_bytes = duration * DOWNLOAD_KBPS * 1000 / 8
+    else:
+        duration = sf.info(audio_filename).duration
+        chunk_seconds = sum(end - start for start, end in timestamps) if timestamps is not None else duration
+        source_bytes = os.path.getsize(audio_filename) * chunk_seconds / duration if duration else 0
+    chunk_bytes = sum(len(chunk[1]) for chunk in chunks)
+    saved = max(0, int(source_bytes - chunk_bytes))
+    print(f"In-memory chunks: {chunk_bytes / 2**20:.2f} MB to upload, {saved / 2**20:.2f} MB less than the downloaded audio")
+    metrics.count("bytes_saved", saved)
+    return saved
+
+def summarize_youtube_video(youtube_url, outputs_dir, use_vad=False, progress=None, streaming=False, in_memory=False, refresh=False, max_workers=8):
+    """Transcribe a video inside its own workspace, outputs_dir/<video id>.
+
+    The downloaded audio and the chunks are kept there with a manifest each, so
+    re-runs skip the download and chunking when those artifacts are still valid.
+    With use_vad=True chunks are cut at speech pauses and silence is skipped
+    (see chunk_audio_on_silence). With streaming=True, download, chunking and
+    transcription overlap instead (see transcribe_youtube_stream) and chunks
+    are fixed-length. With
+    in_memory=True chunks are never written to disk but encoded as compact
+    low-bitrate buffers and uploaded from memory. With refresh=True the
+    downloaded audio is reused but the chunks are made again and every chunk
+    is transcribed again instead of being read from the transcription cache.
+    At most max_workers chunks are transcribed at once.
+    """
+    workspace = os.path.join(outputs_dir, video_id(youtube_url))
+    audio_filename = os.path.join(workspace, "audio.mp3")
+    download_manifest = os.path.join(workspace, "download.json")
+    chunks_dir = os.path.join(workspace, "chunks")
+    chunks_manifest = os.path.join(chunks_dir, "chunks.json")
+    transcripts_file = os.path.join(workspace, "transcripts.txt")
+    segment_length = 20  # chunk to 20 seconds
+    chunk_params = {"method": "vad" if use_vad and not streaming else "fixed", "segment_length": segment_length}
+
+    # the same video can be queued for two officers, so runs on one workspace take turns
+    with workspace_lock(workspace):
+        manifest = None if in_memory or refresh else read_manifest(chunks_manifest, **chunk_params)
+        if manifest is None and streaming:
+            return transcribe_youtube_stream(
+                youtube_url, workspace, segment_length=segment_length, max_workers=max_workers, progress=progress,
+                in_memory=in_memory, refresh=refresh
+            )
+
+        if manifest is None:
+            if read_manifest(download_manifest, files=["audio.mp3"]) is None:
+                youtube_to_mp3(youtube_url, output_dir=workspace, progress=progress)
+                write_manifest(download_manifest, {"url": youtube_url, "files": ["audio.mp3"]})
+            else:
+                print(f"Reusing downloaded audio in {workspace}")
+
+            if progress is not None:
+                progress("chunk", None, "Splitting audio into chunks...")
+
+            # chunk into a private directory and swap it in once complete
+            tmp_chunks_dir = None if in_memory else tempfile.mkdtemp(prefix=".chunks-", dir=workspace)
+            if use_vad:
+                chunked_audio_files, timestamps = chunk_audio_on_silence(
+                    audio_filename, segment_length=segment_length, output_dir=tmp_chunks_dir
+                )
+            else:
+                chunked_audio_files = chunk_audio(
+                    audio_filename, segment_length=segment_length, output_dir=tmp_chunks_dir
+                )
+                timestamps = None
+            if in_memory:
+                report_bytes_saved(chunked_audio_files, audio_filename, timestamps)
+                return transcribe_audio(
+                    chunked_audio_files,
+                    output_file=transcripts_file,
+                    segment_length=segment_length,
+                    timestamps=timestamps,
+                    max_workers=max_workers,
+                    refresh=refresh,
+                    progress=progress
+                )
+            manifest = dict(
+                chunk_params,
+                files=[os.path.basename(f) for f in chunked_audio_files],
+                timestamps=timestamps,
+            )
+            write_manifest(os.path.join(tmp_chunks_dir, "chunks.json"), manifest)
+            if os.path.exists(chunks_dir):
+                shutil.rmtree(chunks_dir)
+            os.replace(tmp_chunks_dir, chunks_dir)
+        else:
+            print(f"Reusing {len(manifest['files'])} chunks in {chunks_dir}")
+
+        transcriptions = transcribe_audio(
+            [os.path.join(chunks_dir, f) for f in manifest["files"]],
+            output_file=transcripts_file,
+            segment_length=segment_length,
+            timestamps=manifest["timestamps"],
+            max_workers=max_workers,
+            refresh=refresh,
+            progress=progress
+        )
+
+        return transcriptions
+
+def ask_gpt(prompt, system_msg="You are a helpful assistant trained in ethical analysis.", model="gpt-3.5-turbo", temperature=0.1, use_cache=True, refresh=False, max_retries=3):
+    """Ask the chat model, caching responses on model, system message, prompt and temperature.
+
+    use_cache=False bypasses the cache entirely, refresh=True skips the lookup
+    but stores the new response.
+    """
+    cache_key = make_key(model, system_msg, prompt, repr(temperature))
+    if use_cache and not refresh:
+        cached = completion_cache.get(cache_key)
+        if cached is not None:
+            print(f"Completion cache hit (hit rate {completion_cache.stats()['hit_rate']:.0%})")
+            metrics.record_request("chat", model, 0.0, cached=True)
+            return cached
+
+    estimated_tokens = estimate_tokens(system_msg) + estimate_tokens(prompt)
+    response, retries, latency = call_openai(
+        "chat", model,
+        lambda: get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature
+        ),
+        tokens=estimated_tokens, max_retries=max_retries
+    )
+    answer = response.choices[0].message.content.strip()
+    prompt_tokens = response.usage.prompt_tokens if response.usage else 0
+    completion_tokens = response.usage.completion_tokens if response.usage else 0
+    if response.usage:
+        ratelimit.limiter("chat").adjust(prompt_tokens + completion_tokens - estimated_tokens)
+    metrics.record_request(
+        "chat", model, latency, retries=retries, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
     )
 
-    return transcriptions
+    if use_cache:
+        completion_cache.set(cache_key, answer)
+    return answer
 
-def ask_gpt(prompt, system_msg="You are a helpful assistant trained in ethical analysis.", model="gpt-3.5-turbo"):
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.1
+class StreamInterrupted(Exception):
+    """The connection broke while a streamed answer was coming in."""
+
+def ask_gpt_stream(prompt, system_msg="You are a helpful assistant trained in ethical analysis.", model="gpt-3.5-turbo", temperature=0.1, use_cache=True, refresh=False, max_retries=3):
+    """Like ask_gpt, but yield the answer piece by piece as the model writes it.
+
+    A cached answer is yielded in one piece, a new one is cached once the
+    stream is complete. Only opening the stream is retried; a connection that
+    breaks while the answer streams in raises StreamInterrupted.
+    """
+    import httpx
+    from openai import APIConnectionError, APITimeoutError
+
+    cache_key = make_key(model, system_msg, prompt, repr(temperature))
+    if use_cache and not refresh:
+        cached = completion_cache.get(cache_key)
+        if cached is not None:
+            metrics.record_request("chat", model, 0.0, cached=True)
+            yield cached
+            return
+
+    estimated_tokens = estimate_tokens(system_msg) + estimate_tokens(prompt)
+    stream, retries, latency = call_openai(
+        "chat", model,
+        lambda: get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        ),
+        tokens=estimated_tokens, max_retries=max_retries
     )
-    return response.choices[0].message.content.strip()
 
-def segment_transcript(transcript):
-    prompt = f"""
+    start = time.perf_counter()
+    pieces = []
+    usage = None
+    try:
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield pieces[-1]
+    except Exception as e:
+        metrics.record_request("chat", model, latency + time.perf_counter() - start, retries=retries, error=type(e).__name__)
+        if isinstance(e, (httpx.TransportError, httpx.StreamError, APIConnectionError, APITimeoutError)):
+            raise StreamInterrupted(f"Answer stream broke off: {e}") from e
+        raise
+    finally:
+        stream.close()
+
+    answer = "".join(pieces).strip()
+    prompt_tokens = usage.prompt_tokens if usage else 0
+    completion_tokens = usage.completion_tokens if usage else 0
+    if usage:
+        ratelimit.limiter("chat").adjust(prompt_tokens + completion_tokens - estimated_tokens)
+    metrics.record_request(
+        "chat", model, latency + time.perf_counter() - start, retries=retries,
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+    )
+
+    if use_cache:
+        completion_cache.set(cache_key, answer)
+
+def ask_gpt_many(prompts, max_workers=4, partial=None, separator="\n\n", max_retries=3, retry_delay=2.0, refresh=False) -> list:
+    """Ask every prompt concurrently and return the answers in prompt order.
+
+    With partial, answers are streamed and partial(text) is called with all
+    answers so far, joined by separator, whenever more text arrives. A stream
+    that breaks off midway is started over, up to max_retries times; errors
+    opening it have already been retried by call_openai and are raised.
+    refresh=True asks the model again instead of using cached answers.
+    """
+    if partial is None:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [metrics.submit(executor, ask_gpt, prompt, refresh=refresh) for prompt in prompts]
+            return [future.result() for future in futures]
+
+    answers = [""] * len(prompts)
+    lock = threading.Lock()
+
+    def stream(i, prompt):
+        for attempt in range(max_retries + 1):
+            try:
+                for piece in ask_gpt_stream(prompt, refresh=refresh, max_retries=max_retries):
+                    with lock:
+                        answers[i] += piece
+                        text = separator.join(answer.strip() for answer in answers if answer)
+                    partial(text)
+                return answers[i].strip()
+            except StreamInterrupted as e:
+                with lock:
+                    answers[i] = ""
+                if attempt == max_retries:
+                    raise
+                print(f"{e}, starting over...")
+                time.sleep(retry_delay * (2 ** attempt))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [metrics.submit(executor, stream, i, prompt) for i, prompt in enumerate(prompts)]
+        return [future.result() for future in futures]
+
+def segment_prompt(transcript, context=None):
+    if context:
+        context_block = f"""This is one part of a longer transcript. The lines under "Previous context" come
+    right before it: use them only to understand the situation and do not segment them.
+
+    Previous context:
+    \"\"\"
+    {context}
+    \"\"\"
+
+    """
+    else:
+        context_block = ""
+
+    return f"""
     You are analyzing a police officer's interaction based on this transcript.
 
     Segment the Transcript into Logical Parts
@@ -178,28 +841,102 @@ def segment_transcript(transcript):
 
 
 
-    Transcript:
+    {context_block}Transcript:
     \"\"\"
     {transcript}
     \"\"\"
     """
 
-    return ask_gpt(prompt)
+def estimate_tokens(text) -> int:
+    """Rough token count for English text (about four characters per token)."""
+    return len(text) // 4 + 1
+
+def split_transcript_windows(lines: list, window_tokens=3000, overlap_lines=3) -> list:
+    """Split transcript lines into windows of about window_tokens tokens.
+
+    Returns (context, lines) pairs, where context is the last overlap_lines
+    lines of the previous window.
+    """
+    windows = []
+    current = []
+    current_tokens = 0
+    for line in lines:
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > window_tokens:
+            windows.append(current)
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        windows.append(current)
+
+    return [
+        (windows[i - 1][-overlap_lines:] if i > 0 and overlap_lines else [], window)
+        for i, window in enumerate(windows)
+    ]
+
+def split_segments(segmented_summary) -> list:
+    """Split segment_transcript output into (title, body) pairs, one per "### Segment N: Title" heading."""
+    segments = []
+    for block in re.split(r"^\s*###\s*Segment\s+\d+\s*[:.\-–]?\s*", segmented_summary, flags=re.MULTILINE)[1:]:
+        title, _, body = block.partition("\n")
+        body = re.sub(r"\n\s*-{3,}\s*$", "", body.rstrip())
+        segments.append((title.strip(), body.strip("\n")))
+    return segments
+
+def join_segments(segments) -> str:
+    """Number (title, body) pairs from 1 and join them back into segment_transcript's format."""
+    return "\n---\n".join(
+        f"### Segment {i}: {title}\n{body}" for i, (title, body) in enumerate(segments, 1)
+    )
+
+@metrics.timed("segment")
+def segment_transcript(transcript, window_tokens=3000, overlap_lines=3, max_workers=4, partial=None, refresh=False):
+    """Split a transcript into logical, numbered segments.
 
+    Transcripts longer than window_tokens are split into windows that are
+    segmented concurrently (each seeing the tail of the previous window as
+    context), then the segments are renumbered and a segment cut in two by a
+    window boundary is merged back together. partial, if given, receives
+    the text generated so far while the answers stream in. refresh=True
+    segments again instead of using cached answers.
+    """
+    lines = transcript if isinstance(transcript, list) else str(transcript).splitlines()
+    if estimate_tokens("\n".join(lines)) <= window_tokens:
+        return ask_gpt_many([segment_prompt("\n".join(lines))], partial=partial, refresh=refresh)[0]
 
-def evaluate_officer_behavior(segmented_summary):
-    prompt = f"""
+    windows = split_transcript_windows(lines, window_tokens=window_tokens, overlap_lines=overlap_lines)
+    print(f"Segmenting transcript in {len(windows)} windows...")
+
+    window_summaries = ask_gpt_many(
+        [segment_prompt("\n".join(lines), context="\n".join(context)) for context, lines in windows],
+        max_workers=max_workers, partial=partial, refresh=refresh
+    )
+
+    segments = []
+    for window_summary in window_summaries:
+        for title, body in split_segments(window_summary):
+            if segments and segments[-1][0].lower() == title.lower():
+                segments[-1] = (title, segments[-1][1] + "\n" + body)
+            else:
+                segments.append((title, body))
+
+    return join_segments(segments)
+
+
+def evaluation_prompt(segmented_summary):
+    domain_list = "\n".join(
+        f"    - {domain}: [{','.join(subdomains)}]" for domain, subdomains in DOMAIN_SUBDOMAINS.items()
+    )
+    return f"""
     Based on this analysis of the officer's actions:
 
     Identify and Label Officer Behavior by Domain (Using Segments)
     Goal: Evaluate each segment for officer actions that demonstrate excellence behaviors, using the
     domains and subdomains below.
     Domains and their subdomains:
-    - Maximum Engagement: [Calls for Service,Arrests,Time to Engage,Self-initiated / Proactive]
-    - Minimal Harm: [Officer Injury Avoidance,Citizen Injury Avoidance,External Complaint Reduction,Citizen Recognition]
-    - Disciplined Conduct: [Attendance,Infractions,Accidents]
-    - Team Player: [Showing Up First,Showing Up for Team,Balance of Call Types]
-    - Skillful Actions: [Time to Resolve,De-escalation,Force Avoidance]
+{domain_list}
     1. For each segment, assess whether the officer demonstrates one or more excellence
     behaviors.
     2. If a behavior is present:
@@ -220,4 +957,30 @@ def evaluate_officer_behavior(segmented_summary):
     \"\"\"
     """
 
-    return ask_gpt(prompt)
+@metrics.timed("evaluate")
+def evaluate_officer_behavior(segmented_summary, per_segment=True, max_workers=4, partial=None, refresh=False):
+    """Label officer behavior by domain and subdomain for a segmented transcript.
+
+    With per_segment=True every "### Segment N" block is evaluated in its own
+    concurrent request and the answers are concatenated in segment order. As
+    responses are cached by prompt, editing one segment only re-evaluates that
+    segment. Summaries without segment headings are evaluated in one request.
+    partial, if given, receives the text generated so far while the answers
+    stream in. refresh=True evaluates again instead of using cached answers.
+    """
+    # keep each block's text exactly as written so unchanged segments hit the cache
+    segment_texts = [
+        re.sub(r"\n\s*-{3,}\s*$", "", block.strip())
+        for block in re.split(r"^(?=\s*###\s*Segment\s+\d+)", segmented_summary, flags=re.MULTILINE)
+        if re.match(r"\s*###\s*Segment\s+\d+", block)
+    ] if per_segment else []
+    if not segment_texts:
+        return ask_gpt_many([evaluation_prompt(segmented_summary)], partial=partial, refresh=refresh)[0]
+
+    print(f"Evaluating {len(segment_texts)} segments...")
+    evaluations = ask_gpt_many(
+        [evaluation_prompt(text) for text in segment_texts], max_workers=max_workers, partial=partial,
+        refresh=refresh
+    )
+
+    return "\n\n".join(evaluation for evaluation in evaluations if evaluation)
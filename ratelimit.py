@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+
+# Requests and tokens per minute allowed per kind of OpenAI call, set these to your account's limits
+LIMITS = {
+    "transcription": {"rpm": int(os.getenv("WHISPER_RPM", "50")), "tpm": None},
+    "chat": {"rpm": int(os.getenv("CHAT_RPM", "3500")), "tpm": int(os.getenv("CHAT_TPM", "200000"))},
+}
+
+# After a rate limit response the allowed rate is halved (down to MIN_SCALE of the limit)
+# and then raised again by RECOVERY of the limit with every successful request.
+MIN_SCALE = 0.1
+RECOVERY = 0.05
+DEFAULT_COOLDOWN = 1.0
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 per second and holds at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.base_rate = per_minute / 60
+        self.rate = self.base_rate
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now) -> float:
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by every thread of the process.
+
+    acquire() blocks until a request fits. backoff() is called on a rate limit
+    response: every caller pauses for the retry-after delay and the allowed
+    rate is cut, then recovers with each success().
+    """
+
+    def __init__(self, rpm, tpm=None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.scale = 1.0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def _buckets(self):
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    def _set_scale(self, scale, now):
+        self.scale = scale
+        for bucket in self._buckets():
+            bucket.refill(now)
+            bucket.rate = bucket.base_rate * scale
+
+    def acquire(self, tokens=0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(
+                    self.cooldown_until - now,
+                    self.requests.wait_time(1, now),
+                    self.tokens.wait_time(tokens, now) if self.tokens else 0.0,
+                )
+                if wait <= 0:
+                    self.requests.level -= 1
+                    if self.tokens:
+                        self.tokens.level -= tokens
+                    return
+            time.sleep(min(wait, 1.0))
+
+    def adjust(self, tokens):
+        """Charge (or refund, if negative) the difference between the estimated and the actual token usage."""
+        if self.tokens:
+            with self._lock:
+                self.tokens.level -= tokens
+
+    def backoff(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            # requests already in flight when the limit tripped count as one rate limit
+            if now >= self.cooldown_until:
+                self._set_scale(max(MIN_SCALE, self.scale / 2), now)
+            delay = retry_after if retry_after is not None else DEFAULT_COOLDOWN
+            self.cooldown_until = max(self.cooldown_until, now + delay)
+        print(f"Rate limited, pausing for {delay:.1f}s at {self.scale:.0%} of the limit")
+
+    def success(self):
+        if self.scale < 1.0:
+            with self._lock:
+                self._set_scale(min(1.0, self.scale + RECOVERY), time.monotonic())
+
+
+limiters = {kind: RateLimiter(**limits) for kind, limits in LIMITS.items()}
+
+
+def limiter(kind) -> RateLimiter:
+    return limiters[kind]
+
+
+def share_limits(processes):
+    """Give this process 1/processes of every limit, when that many processes use the same account."""
+    for kind, limits in LIMITS.items():
+        limiters[kind] = RateLimiter(
+            rpm=max(1, limits["rpm"] // processes),
+            tpm=max(1, limits["tpm"] // processes) if limits["tpm"] else None,
+        )
+
+
+def retry_after(error):
+    """Seconds to wait according to the headers of a rate limit error, or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000
+        if "retry-after" in response.headers:
+            return float(response.headers["retry-after"])
+    except ValueError:
+        pass
+    return None
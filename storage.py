@@ -0,0 +1,361 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+from contextlib import closing
+
+DB_PATH = os.getenv("OFFICERS_DB", "data/officers.db")
+JSON_PATH = "assets/officers_data.json"
+
+# Excellence domains and their subdomains, as used by the evaluation prompt
+DOMAIN_SUBDOMAINS = {
+    "Maximum Engagement": ["Calls for Service", "Arrests", "Time to Engage", "Self-initiated / Proactive"],
+    "Minimal Harm": ["Officer Injury Avoidance", "Citizen Injury Avoidance", "External Complaint Reduction", "Citizen Recognition"],
+    "Disciplined Conduct": ["Attendance", "Infractions", "Accidents"],
+    "Team Player": ["Showing Up First", "Showing Up for Team", "Balance of Call Types"],
+    "Skillful Actions": ["Time to Resolve", "De-escalation", "Force Avoidance"],
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    officer TEXT NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    transcript TEXT,
+    segments TEXT,
+    evaluation TEXT,
+    UNIQUE (officer, url)
+);
+CREATE INDEX IF NOT EXISTS videos_url ON videos (url);
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY,
+    video_id INTEGER NOT NULL REFERENCES videos (id) ON DELETE CASCADE,
+    officer TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    subdomain TEXT NOT NULL,
+    quote TEXT,
+    summary TEXT,
+    reference TEXT,
+    start_time INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS evaluations_officer_domain ON evaluations (officer, domain, subdomain);
+CREATE INDEX IF NOT EXISTS evaluations_video ON evaluations (video_id);
+CREATE TABLE IF NOT EXISTS domain_counts (
+    officer TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    subdomain TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (officer, domain, subdomain)
+);
+CREATE TABLE IF NOT EXISTS search_entries (
+    id INTEGER PRIMARY KEY,
+    video_id INTEGER NOT NULL REFERENCES videos (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    start_time INTEGER NOT NULL DEFAULT 0,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS search_entries_video ON search_entries (video_id, kind);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5 (
+    text, content = 'search_entries', content_rowid = 'id', tokenize = 'porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS search_entries_insert AFTER INSERT ON search_entries BEGIN
+    INSERT INTO search_index (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS search_entries_delete AFTER DELETE ON search_entries BEGIN
+    INSERT INTO search_index (search_index, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+SCHEMA_VERSION = 3
+
+VIDEO_FIELDS = ("transcript", "segments", "evaluation")
+
+_initialized = set()
+
+
+def connect(db_path=None) -> sqlite3.Connection:
+    """Open the officers database, creating it and importing the legacy JSON file on first use."""
+    db_path = db_path or DB_PATH
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if db_path not in _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        # import_json indexes as it goes, so only databases that already had videos need reindexing
+        had_videos = conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] > 0
+        if not had_videos and os.path.exists(JSON_PATH):
+            import_json(JSON_PATH, conn)
+        if version < 1 and had_videos:
+            reindex_evaluations(conn)
+        if version < 2 and "metrics" not in [row["name"] for row in conn.execute("PRAGMA table_info(videos)")]:
+            conn.execute("ALTER TABLE videos ADD COLUMN metrics TEXT")
+        if version < 3 and had_videos:
+            reindex_search(conn)
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        _initialized.add(db_path)
+    return conn
+
+
+def import_json(json_path, conn):
+    """Copy every officer video from an officers_data.json file into the database."""
+    with open(json_path, "r") as file:
+        data = json.load(file)
+
+    with conn:
+        for officer, videos in data.items():
+            for video in videos:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO videos (officer, title, url, transcript, segments, evaluation) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        officer,
+                        video["title"],
+                        video["url"],
+                        json.dumps(video["transcript"]) if video.get("transcript") else None,
+                        video.get("segments") or None,
+                        video.get("evaluation") or None,
+                    ),
+                )
+                if cursor.rowcount and video.get("transcript"):
+                    _index_transcript(conn, cursor.lastrowid, video["transcript"])
+                if cursor.rowcount and video.get("evaluation"):
+                    _index_evaluation(conn, cursor.lastrowid, officer, video["evaluation"])
+    print(f"Imported {sum(len(videos) for videos in data.values())} videos from {json_path}")
+
+
+def parse_evaluation(evaluation) -> list:
+    """Split evaluate_officer_behavior markdown into one dict per **Domain** block."""
+    records = []
+    current_eval = {}
+    for line in evaluation.splitlines():
+        line = line.strip()
+        if line.startswith("**Domain**:"):
+            current_eval["domain"] = line.replace("**Domain**:", "").strip()
+        elif line.startswith("**Subdomain**:"):
+            current_eval["subdomain"] = line.replace("**Subdomain**:", "").strip()
+        elif line.startswith("**Quote**:"):
+            current_eval["quote"] = line.replace("**Quote**:", "").strip()
+        elif line.startswith("**Summary**:"):
+            current_eval["summary"] = line.replace("**Summary**:", "").strip()
+        elif line.startswith("**Reference**:"):
+            current_eval["reference"] = line.replace("**Reference**:", "").strip()
+            if "domain" in current_eval and "subdomain" in current_eval:
+                current_eval["start_time"] = reference_start_time(current_eval["reference"])
+                records.append(current_eval)
+            current_eval = {}
+    return records
+
+
+def reference_start_time(reference) -> int:
+    """Seconds at which a reference like 'Segment 2 - Title (60s - 100s)' starts, 0 if it has no timing."""
+    match = re.search(r"\((\d+)\s*s?\s*-", reference)
+    return int(match.group(1)) if match else 0
+
+
+def transcript_start_time(line) -> int:
+    """Seconds at which a transcript line like '[60s - 80s]: ...' starts, 0 if it has no timing."""
+    match = re.match(r"\s*\[(\d+)\s*s?\s*-", line)
+    return int(match.group(1)) if match else 0
+
+
+def _index_search(conn, video_id, kind, entries):
+    """Replace the full-text search entries of one kind ('transcript' or 'quote') of a video with (start_time, text) pairs."""
+    conn.execute("DELETE FROM search_entries WHERE video_id = ? AND kind = ?", (video_id, kind))
+    conn.executemany(
+        "INSERT INTO search_entries (video_id, kind, start_time, text) VALUES (?, ?, ?, ?)",
+        [(video_id, kind, start_time, text) for start_time, text in entries if text],
+    )
+
+
+def _index_transcript(conn, video_id, transcript):
+    _index_search(conn, video_id, "transcript", [
+        (transcript_start_time(line), re.sub(r"^\s*\[[^\]]*\]:?\s*", "", line)) for line in transcript or []
+    ])
+
+
+def _index_evaluation(conn, video_id, officer, evaluation):
+    records = parse_evaluation(evaluation or "")
+    conn.execute("DELETE FROM evaluations WHERE video_id = ?", (video_id,))
+    conn.executemany(
+        "INSERT INTO evaluations (video_id, officer, domain, subdomain, quote, summary, reference, start_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (video_id, officer, record["domain"], record["subdomain"], record.get("quote", ""),
+             record.get("summary", ""), record["reference"], record["start_time"])
+            for record in records
+        ],
+    )
+    _index_search(conn, video_id, "quote", [(record["start_time"], record.get("quote", "")) for record in records])
+    conn.execute("DELETE FROM domain_counts WHERE officer = ?", (officer,))
+    conn.execute(
+        "INSERT INTO domain_counts (officer, domain, subdomain, count) "
+        "SELECT officer, domain, subdomain, COUNT(*) FROM evaluations WHERE officer = ? "
+        "GROUP BY domain, subdomain",
+        (officer,),
+    )
+
+
+def reindex_evaluations(conn):
+    """Rebuild the evaluation records of every video from its evaluation markdown."""
+    with conn:
+        for row in conn.execute("SELECT id, officer, evaluation FROM videos").fetchall():
+            _index_evaluation(conn, row["id"], row["officer"], row["evaluation"])
+
+
+def reindex_search(conn):
+    """Rebuild the full-text search entries of every video."""
+    with conn:
+        conn.execute("DELETE FROM search_entries")
+        for row in conn.execute("SELECT id, transcript FROM videos WHERE transcript IS NOT NULL").fetchall():
+            _index_transcript(conn, row["id"], json.loads(row["transcript"]))
+        conn.execute(
+            "INSERT INTO search_entries (video_id, kind, start_time, text) "
+            "SELECT video_id, 'quote', start_time, quote FROM evaluations WHERE quote != ''"
+        )
+
+
+def _video_from_row(row) -> dict:
+    video = {"title": row["title"], "url": row["url"]}
+    if row["transcript"]:
+        video["transcript"] = json.loads(row["transcript"])
+    if row["segments"]:
+        video["segments"] = row["segments"]
+    if row["evaluation"]:
+        video["evaluation"] = row["evaluation"]
+    if row["metrics"]:
+        video["metrics"] = json.loads(row["metrics"])
+    return video
+
+
+def list_officers() -> list:
+    with closing(connect()) as conn:
+        rows = conn.execute("SELECT officer FROM videos GROUP BY officer ORDER BY MIN(id)").fetchall()
+    return [row["officer"] for row in rows]
+
+
+def get_videos(officer) -> list:
+    """Return the officer's videos as dicts shaped like the old officers_data.json entries."""
+    with closing(connect()) as conn:
+        rows = conn.execute("SELECT * FROM videos WHERE officer = ? ORDER BY id", (officer,)).fetchall()
+    return [_video_from_row(row) for row in rows]
+
+
+def get_video(officer, url):
+    with closing(connect()) as conn:
+        row = conn.execute("SELECT * FROM videos WHERE officer = ? AND url = ?", (officer, url)).fetchone()
+    return _video_from_row(row) if row else None
+
+
+def add_video(officer, title, url):
+    with closing(connect()) as conn, conn:
+        conn.execute(
+            "INSERT INTO videos (officer, title, url) VALUES (?, ?, ?) "
+            "ON CONFLICT (officer, url) DO UPDATE SET title = excluded.title",
+            (officer, title, url),
+        )
+
+
+def update_video(officer, url, **fields):
+    """Atomically set transcript, segments and/or evaluation on one video."""
+    unknown = set(fields) - set(VIDEO_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown video fields: {', '.join(sorted(unknown))}")
+
+    transcript = fields.get("transcript")
+    if transcript is not None:
+        fields["transcript"] = json.dumps(transcript)
+
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with closing(connect()) as conn, conn:
+        conn.execute(
+            f"UPDATE videos SET {assignments} WHERE officer = ? AND url = ?",
+            (*fields.values(), officer, url),
+        )
+        if "transcript" in fields or "evaluation" in fields:
+            row = conn.execute("SELECT id FROM videos WHERE officer = ? AND url = ?", (officer, url)).fetchone()
+            if row and "transcript" in fields:
+                _index_transcript(conn, row["id"], transcript)
+            if row and "evaluation" in fields:
+                _index_evaluation(conn, row["id"], officer, fields["evaluation"])
+
+
+def save_metrics(officer, url, stage, summary):
+    """Store the metrics summary of one pipeline stage run on the video, replacing that stage's previous run."""
+    # json_set in one UPDATE, so concurrent stages of the same video never overwrite each other's metrics
+    with closing(connect()) as conn, conn:
+        conn.execute(
+            "UPDATE videos SET metrics = json_set(COALESCE(metrics, '{}'), '$.\"' || ? || '\"', json(?)) "
+            "WHERE officer = ? AND url = ?",
+            (stage, json.dumps(summary), officer, url),
+        )
+
+
+def get_evaluations(officer, domain, subdomains) -> list:
+    """Evaluation records of an officer in one domain and any of the given subdomains, with their video."""
+    placeholders = ", ".join("?" for _ in subdomains)
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT evaluations.*, videos.title, videos.url FROM evaluations "
+            "JOIN videos ON videos.id = evaluations.video_id "
+            f"WHERE evaluations.officer = ? AND domain = ? AND subdomain IN ({placeholders}) "
+            "ORDER BY evaluations.video_id, evaluations.id",
+            (officer, domain, *subdomains),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def domain_counts(officer=None) -> dict:
+    """Number of evaluations per (domain, subdomain), for one officer or summed over all officers."""
+    with closing(connect()) as conn:
+        if officer is None:
+            rows = conn.execute(
+                "SELECT domain, subdomain, SUM(count) AS count FROM domain_counts GROUP BY domain, subdomain"
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT domain, subdomain, count FROM domain_counts WHERE officer = ?", (officer,)
+            ).fetchall()
+    return {(row["domain"], row["subdomain"]): row["count"] for row in rows}
+
+
+def fts_query(text) -> str:
+    """Turn user input into an FTS5 query: every word (or "quoted phrase") must match, words also match as prefixes."""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', text):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '""') + '"')
+        elif word.strip('"'):
+            terms.append('"' + word.strip('"').replace('"', '""') + '"*')
+    return " ".join(terms)
+
+
+def search(text, officer=None, limit=50) -> list:
+    """Transcript lines and evaluation quotes matching text, best match first, with their officer, video and start time."""
+    query = fts_query(text)
+    if not query:
+        return []
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT search_entries.kind, search_entries.start_time, search_entries.text, "
+            "snippet(search_index, 0, '**', '**', '…', 16) AS snippet, "
+            "videos.officer, videos.title, videos.url FROM search_index "
+            "JOIN search_entries ON search_entries.id = search_index.rowid "
+            "JOIN videos ON videos.id = search_entries.video_id "
+            "WHERE search_index MATCH ? AND (? IS NULL OR videos.officer = ?) "
+            "ORDER BY bm25(search_index) LIMIT ?",
+            (query, officer, officer, limit),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+if __name__ == "__main__":
+    # One-time migration: python storage.py [path/to/officers_data.json]
+    with closing(connect()) as conn:
+        import_json(sys.argv[1] if len(sys.argv) > 1 else JSON_PATH, conn)